@@ -12,38 +12,164 @@ import re
 import shutil
 from datetime import datetime
 
+# Shared backup suffix so every file backed up in one run gets the same stamp
+_RUN_TIMESTAMP = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+# Patterns used by patch_text2video_panel(), compiled once at import
+_OLD_RENDER_RE = re.compile(
+    r'def _render_card_text\(self, scene(?:\s*:\s*int)?\):.*?return.*?\n', re.DOTALL
+)
+# Import patterns are anchored to a single line so they cannot run into the
+# next import statement (the QtWidgets one is the parenthesised block)
+_QTCORE_IMPORT_RE = re.compile(r'^(from PyQt5\.QtCore import [^(\n]+)$', re.M)
+_QTWIDGETS_IMPORT_RE = re.compile(r'(from PyQt5\.QtWidgets import \([^)]+)\)')
+_QTGUI_IMPORT_RE = re.compile(r'^(from PyQt5\.QtGui import [^(\n]+)$', re.M)
+
+# Top-level import statements (single line or parenthesised block); indented
+# function-local imports are deliberately not matched
+_IMPORT_STMT_RE = re.compile(r'^(?:from[ \t]+\S+[ \t]+)?import[ \t]+(?:\([^)]*\)|[^\n]*)', re.M)
+_NAME_RE = re.compile(r'\b[A-Za-z_][A-Za-z0-9_]*\b')
+
+# Literal anchors, located with str.find rather than a regex
+_STORYBOARD_INSERT_ANCHOR = 'class CollapsibleGroupBox'
+_RENDER_ANCHOR = 'def _render_card_text(self, scene'
+_SCENES_TAB_START = 'self.cards = QListWidget()'
+_SCENES_TAB_END = 'self.cards.setIconSize(QSize(240, 135))'
+_POPULATE_ANCHOR = 'self.cards.addItem(it)'
+
+# Every anchor the patch depends on, by the label reported when missing
+_REQUIRED_ANCHORS = {
+    'StoryboardView insertion point (class CollapsibleGroupBox)': _STORYBOARD_INSERT_ANCHOR,
+    '_render_card_text() method': _RENDER_ANCHOR,
+    'scenes tab start (self.cards = QListWidget())': _SCENES_TAB_START,
+    'scenes tab end (self.cards.setIconSize(...))': _SCENES_TAB_END,
+    'scene population (self.cards.addItem(it))': _POPULATE_ANCHOR,
+}
+
 
 def backup_file(file_path):
-    """Create backup of original file"""
-    backup_path = f"{file_path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    shutil.copy2(file_path, backup_path)
+    """Create backup of original file (contents only, metadata is not needed)"""
+    backup_path = f"{file_path}.backup_{_RUN_TIMESTAMP}"
+    shutil.copyfile(file_path, backup_path)
     print(f"✅ Created backup: {backup_path}")
     return backup_path
 
 
-def patch_text2video_panel():
-    """Main patching function for ui/text2video_panel.py"""
-    
-    file_path = "ui/text2video_panel.py"
-    
-    if not os.path.exists(file_path):
-        print(f"❌ File not found: {file_path}")
-        print("   Please run this script from the project root directory")
-        return False
-    
-    # Backup original file
-    backup_file(file_path)
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    print(f"📝 Patching {file_path}...")
-    
-    # ========================================
-    # STEP 1: Add StoryboardView class at the beginning (after imports)
-    # ========================================
+# Shared QSS/HTML constants + StoryboardView widget, inserted before
+# CollapsibleGroupBox (raw so the emitted "\n" escape survives)
+_STORYBOARD_CLASS = r'''
+
+_TOGGLE_BTN_QSS = """
+QPushButton {
+    background: white;
+    border: 2px solid #BDBDBD;
+    border-radius: 6px;
+    font-size: 13px;
+    font-weight: 600;
+    padding: 6px 12px;
+}
+QPushButton:checked {
+    background: #1E88E5;
+    border: 2px solid #1E88E5;
+    color: white;
+}
+QPushButton:hover {
+    border: 2px solid #1E88E5;
+}
+"""
+
+_PROMPT_DIALOG_QSS = """
+QDialog {
+    background: #FAFAFA;
+}
+QLabel {
+    color: #212121;
+}
+QTextEdit {
+    background: white;
+    border: 2px solid #E0E0E0;
+    border-radius: 6px;
+    padding: 8px;
+    font-size: 11px;
+    color: #424242;
+}
+QPushButton {
+    background: white;
+    border: 2px solid #BDBDBD;
+    border-radius: 6px;
+    padding: 8px 16px;
+    font-size: 13px;
+    font-weight: 600;
+}
+QPushButton:hover {
+    background: #F5F5F5;
+    border: 2px solid #1E88E5;
+}
+QPushButton#btn_close {
+    background: #1E88E5;
+    border: 2px solid #1E88E5;
+    color: white;
+}
+QPushButton#btn_close:hover {
+    background: #1976D2;
+}
+"""
+
+# Prebuilt HTML fragments for Text2VideoPane._render_card_text()
+_CARD_TITLE_TMPL = '<b style="font-size:14px; color:#1E88E5;">🎬 Cảnh {n}</b>'
+_CARD_SEP = '━━━━━━━━━━━━━━━━━━━━'
+_CARD_PROMPT_HDR = '<span style="font-size:11px; font-weight:600;">📝 PROMPT:</span>'
+_CARD_PROMPT_TMPL = '<span style="font-size:11px; color:#424242;">{text}</span>'
+_CARD_VIDEO_HDR = '<span style="font-size:11px; font-weight:600;">🎥 VIDEO:</span>'
+_CARD_VIDEO_TMPL = '<span style="font-size:10px; color:#616161;">  #{copy}: {status}</span>'
+_CARD_VIDEO_DONE_TMPL = (
+    '<span style="font-size:10px; color:#616161;">  #{copy}: {status} — {done}</span>'
+)
+_CARD_VIDEO_FILE_TMPL = '<span style="font-size:10px; color:#757575;">  📥 {name}</span>'
+
+
+def _existing_mtimes(paths):
+    """Return {path: mtime} for the paths that exist, listing each directory only once"""
+    listings = {}
+    found = {}
+    for path in paths:
+        folder, name = os.path.split(path)
+        if folder not in listings:
+            try:
+                with os.scandir(folder or '.') as entries:
+                    listings[folder] = {e.name: e for e in entries}
+            except OSError:
+                listings[folder] = {}
+        entry = listings[folder].get(name)
+        if entry is not None:
+            # Only the wanted entries are stat'ed (free on Windows, from the listing)
+            try:
+                found[path] = entry.stat().st_mtime
+            except OSError:
+                pass
+    return found
+
+
+_THUMB_SIZE = QSize(242, 136)
+
+
+def _load_thumbnail(path, mtime=None):
+    """Load a 242x136 thumbnail through QPixmapCache, keyed by path + mtime
     
-    storyboard_class = '''
+    mtime is stat'ed here unless the caller already has it.
+    """
+    if mtime is None:
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return QPixmap()
+    key = f"{path}|{mtime}|242x136"
+    pixmap = QPixmapCache.find(key)
+    if pixmap is None or pixmap.isNull():
+        pixmap = QPixmap(path).scaled(_THUMB_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        QPixmapCache.insert(key, pixmap)
+    return pixmap
+
 
 class StoryboardView(QWidget):
     """
@@ -53,9 +179,22 @@ class StoryboardView(QWidget):
     
     scene_clicked = pyqtSignal(int)  # Emit scene number when clicked
     
+    # Shared by every card; created on first use since QFont needs a QApplication
+    _CARD_FONT = None
+    
+    @classmethod
+    def _card_font(cls):
+        if cls._CARD_FONT is None:
+            cls._CARD_FONT = QFont("Segoe UI", 9)
+        return cls._CARD_FONT
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
+        # Keep decoded thumbnails around across view toggles (limit is in KB)
+        if QPixmapCache.cacheLimit() < 65536:
+            QPixmapCache.setCacheLimit(65536)
+        
         # Main scroll area
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
@@ -78,7 +217,8 @@ class StoryboardView(QWidget):
         
         self.scene_cards = {}  # Store card widgets by scene number
     
-    def add_scene(self, scene_num, thumbnail_path, prompt_text, state_dict):
+    def add_scene(self, scene_num, thumbnail_path, prompt_text, state_dict, thumbnail_exists=None,
+                  thumbnail_mtime=None):
         """
         Add scene card to grid
         
@@ -87,6 +227,9 @@ class StoryboardView(QWidget):
             thumbnail_path: Path to thumbnail image
             prompt_text: Prompt text to display
             state_dict: Full state dict for this scene
+            thumbnail_exists: Pre-checked existence of thumbnail_path
+                (checked here when None)
+            thumbnail_mtime: Known mtime of thumbnail_path, saves a stat
         """
         row = (scene_num - 1) // 3
         col = (scene_num - 1) % 3
@@ -123,15 +266,16 @@ class StoryboardView(QWidget):
             font-size: 11px;
         """)
         
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            pixmap = QPixmap(thumbnail_path).scaled(
-                242, 136, Qt.KeepAspectRatio, Qt.SmoothTransformation
-            )
-            thumb_label.setPixmap(pixmap)
+        if thumbnail_exists is None:
+            thumbnail_exists = bool(thumbnail_path) and os.path.exists(thumbnail_path)
+        
+        if thumbnail_path and thumbnail_exists:
+            thumb_label.setPixmap(_load_thumbnail(thumbnail_path, thumbnail_mtime))
         else:
             thumb_label.setText("🖼️\nChưa tạo ảnh")
         
         card_layout.addWidget(thumb_label)
+        card.thumb_label = thumb_label
         
         # Scene title (bold, blue)
         title_label = QLabel(f"<b style='color:#1E88E5; font-size:13px;'>🎬 Cảnh {scene_num}</b>")
@@ -143,7 +287,7 @@ class StoryboardView(QWidget):
         desc_label = QLabel(preview_text)
         desc_label.setWordWrap(True)
         desc_label.setAlignment(Qt.AlignCenter)
-        desc_label.setFont(QFont("Segoe UI", 9))
+        desc_label.setFont(self._card_font())
         desc_label.setStyleSheet("color: #757575;")
         desc_label.setMaximumHeight(40)
         card_layout.addWidget(desc_label)
@@ -151,11 +295,15 @@ class StoryboardView(QWidget):
         # Video status indicator
         vids = state_dict.get('videos', {})
         if vids:
-            completed = sum(1 for v in vids.values() if v.get('status') == 'completed')
-            total = len(vids)
+            completed = 0
+            total = 0
+            for v in vids.values():
+                total += 1
+                if v.get('status') == 'completed':
+                    completed += 1
             status_label = QLabel(f"🎥 {completed}/{total} videos")
             status_label.setAlignment(Qt.AlignCenter)
-            status_label.setFont(QFont("Segoe UI", 9))
+            status_label.setFont(self._card_font())
             status_label.setStyleSheet("color: #4CAF50; font-weight: bold;")
             card_layout.addWidget(status_label)
         
@@ -181,106 +329,63 @@ class StoryboardView(QWidget):
         if not card:
             return
         
-        # Find thumbnail label (first child widget)
-        thumb_label = card.findChild(QLabel)
+        thumb_label = getattr(card, 'thumb_label', None)
         if thumb_label and os.path.exists(thumbnail_path):
-            pixmap = QPixmap(thumbnail_path).scaled(
-                242, 136, Qt.KeepAspectRatio, Qt.SmoothTransformation
-            )
-            thumb_label.setPixmap(pixmap)
+            thumb_label.setPixmap(_load_thumbnail(thumbnail_path))
 '''
-    
-    # Find where to insert (after imports, before CollapsibleGroupBox)
-    insert_pos = content.find("class CollapsibleGroupBox")
-    if insert_pos == -1:
-        print("❌ Could not find insertion point for StoryboardView class")
-        return False
-    
-    content = content[:insert_pos] + storyboard_class + "\n\n" + content[insert_pos:]
-    print("✅ Added StoryboardView class")
-    
-    # ========================================
-    # STEP 2: Update _render_card_text() method
-    # ========================================
-    
-    # Find the method
-    old_render_pattern = r'def _render_card_text\(self, scene\):.*?return.*?\n'
-    
-    new_render_method = '''def _render_card_text(self, scene):
+
+# Replacement for Text2VideoPane._render_card_text()
+_NEW_RENDER_METHOD = '''def _render_card_text(self, scene):
         """Render card text with improved styling - Issue #7"""
+        # Card content changed, so the storyboard copy is stale too
+        self._storyboard_dirty = True
         st = self._cards_state.get(scene, {})
         vi = st.get('vi', '').strip()
         tgt = st.get('tgt', '').strip()
         
         # Bold, blue scene title (14px) - Issue #7 requirement
-        lines = [f'<b style="font-size:14px; color:#1E88E5;">🎬 Cảnh {scene}</b>']
-        lines.append('━━━━━━━━━━━━━━━━━━━━')
+        parts = [_CARD_TITLE_TMPL.format(n=scene), _CARD_SEP]
         
         # Prompt text (11px, truncated to 150 chars) - Issue #7 requirement
-        if tgt or vi:
-            lines.append('<span style="font-size:11px; font-weight:600;">📝 PROMPT:</span>')
-            prompt_text = (tgt or vi)[:150]
-            if len(tgt or vi) > 150:
-                prompt_text += '...'
-            lines.append(f'<span style="font-size:11px; color:#424242;">{prompt_text}</span>')
+        prompt_src = tgt or vi
+        if prompt_src:
+            parts.append(_CARD_PROMPT_HDR)
+            prompt_text = prompt_src[:150] + ('...' if len(prompt_src) > 150 else '')
+            parts.append(_CARD_PROMPT_TMPL.format(text=prompt_text))
         
         # Video status
         vids = st.get('videos', {})
         if vids:
-            lines.append('')
-            lines.append('<span style="font-size:11px; font-weight:600;">🎥 VIDEO:</span>')
+            parts.append('')
+            parts.append(_CARD_VIDEO_HDR)
             for copy, info in sorted(vids.items()):
                 status = info.get('status', '?')
-                tag = f'<span style="font-size:10px; color:#616161;">  #{copy}: {status}</span>'
-                if info.get('completed_at'):
-                    tag = f'<span style="font-size:10px; color:#616161;">  #{copy}: {status} — {info["completed_at"]}</span>'
-                lines.append(tag)
+                done = info.get('completed_at')
+                if done:
+                    parts.append(_CARD_VIDEO_DONE_TMPL.format(copy=copy, status=status, done=done))
+                else:
+                    parts.append(_CARD_VIDEO_TMPL.format(copy=copy, status=status))
                 
                 if info.get('path'):
-                    lines.append(f'<span style="font-size:10px; color:#757575;">  📥 {os.path.basename(info["path"])}</span>')
+                    parts.append(_CARD_VIDEO_FILE_TMPL.format(name=os.path.basename(info['path'])))
         
-        return '<br>'.join(lines)
+        return '<br>'.join(parts)
 '''
-    
-    content = re.sub(old_render_pattern, new_render_method, content, flags=re.DOTALL)
-    print("✅ Updated _render_card_text() method")
-    
-    # ========================================
-    # STEP 3: Add toggle buttons and storyboard view in scenes tab
-    # ========================================
-    
-    # Find the scenes tab section (around line 494-509)
-    scenes_tab_pattern = r'(self\.cards = QListWidget\(\).*?self\.cards\.setIconSize\(QSize\(240, 135\)\))'
-    
-    new_scenes_tab = r'''# === Scene View Toggle Buttons (Issue #7) ===
+
+# Scenes tab with Card/Storyboard toggle; replaces the plain QListWidget setup
+_NEW_SCENES_TAB = r'''# === Scene View Toggle Buttons (Issue #7) ===
         toggle_widget = QWidget()
         toggle_layout = QHBoxLayout(toggle_widget)
         toggle_layout.setContentsMargins(8, 8, 8, 8)
         toggle_layout.setSpacing(8)
+        # One stylesheet on the parent styles both toggle buttons
+        toggle_widget.setStyleSheet(_TOGGLE_BTN_QSS)
         
         self.btn_view_card = QPushButton("📇 Card")
         self.btn_view_card.setCheckable(True)
         self.btn_view_card.setChecked(True)
         self.btn_view_card.setFixedHeight(34)
         self.btn_view_card.setFixedWidth(100)
-        self.btn_view_card.setStyleSheet("""
-            QPushButton {
-                background: white;
-                border: 2px solid #BDBDBD;
-                border-radius: 6px;
-                font-size: 13px;
-                font-weight: 600;
-                padding: 6px 12px;
-            }
-            QPushButton:checked {
-                background: #1E88E5;
-                border: 2px solid #1E88E5;
-                color: white;
-            }
-            QPushButton:hover {
-                border: 2px solid #1E88E5;
-            }
-        """)
         self.btn_view_card.clicked.connect(lambda: self._switch_view('card'))
         
         self.btn_view_storyboard = QPushButton("📊 Storyboard")
@@ -288,24 +393,6 @@ class StoryboardView(QWidget):
         self.btn_view_storyboard.setChecked(False)
         self.btn_view_storyboard.setFixedHeight(34)
         self.btn_view_storyboard.setFixedWidth(120)
-        self.btn_view_storyboard.setStyleSheet("""
-            QPushButton {
-                background: white;
-                border: 2px solid #BDBDBD;
-                border-radius: 6px;
-                font-size: 13px;
-                font-weight: 600;
-                padding: 6px 12px;
-            }
-            QPushButton:checked {
-                background: #1E88E5;
-                border: 2px solid #1E88E5;
-                color: white;
-            }
-            QPushButton:hover {
-                border: 2px solid #1E88E5;
-            }
-        """)
         self.btn_view_storyboard.clicked.connect(lambda: self._switch_view('storyboard'))
         
         toggle_layout.addWidget(self.btn_view_card)
@@ -315,6 +402,9 @@ class StoryboardView(QWidget):
         scenes_layout.addWidget(toggle_widget)
         
         # === Stacked Widget for View Switching ===
+        # Storyboard is rebuilt lazily: only when shown and stale
+        self._storyboard_dirty = True
+        self._storyboard_refresh_pending = False
         self.view_stack = QStackedWidget()
         
         # Card view (existing QListWidget)
@@ -330,15 +420,9 @@ class StoryboardView(QWidget):
         self.view_stack.addWidget(self.storyboard_view)
         
         scenes_layout.addWidget(self.view_stack)'''
-    
-    content = re.sub(scenes_tab_pattern, new_scenes_tab, content, flags=re.DOTALL)
-    print("✅ Added toggle buttons and storyboard view")
-    
-    # ========================================
-    # STEP 4: Add new methods at the end of class
-    # ========================================
-    
-    new_methods = '''
+
+# Storyboard / prompt detail methods appended to the panel class
+_NEW_METHODS = '''
     # ========================================
     # Issue #7: Storyboard View and Prompt Detail Dialog
     # ========================================
@@ -353,17 +437,47 @@ class StoryboardView(QWidget):
             self.view_stack.setCurrentIndex(1)
             self.btn_view_card.setChecked(False)
             self.btn_view_storyboard.setChecked(True)
+            if self._storyboard_dirty:
+                self._refresh_storyboard()
+    
+    def _schedule_storyboard_refresh(self):
+        """Mark storyboard stale and coalesce refreshes into one event-loop pass"""
+        self._storyboard_dirty = True
+        if not getattr(self, '_storyboard_refresh_pending', False):
+            self._storyboard_refresh_pending = True
+            QTimer.singleShot(0, self._maybe_refresh_storyboard)
+    
+    def _maybe_refresh_storyboard(self):
+        """Rebuild storyboard if it is visible and stale"""
+        self._storyboard_refresh_pending = False
+        if hasattr(self, 'view_stack') and self._storyboard_dirty and self.view_stack.currentIndex() == 1:
             self._refresh_storyboard()
     
     def _refresh_storyboard(self):
         """Refresh storyboard view with current scenes"""
+        self._storyboard_dirty = False
         self.storyboard_view.clear()
         
-        for scene_num in sorted(self._cards_state.keys()):
+        # Re-sort only when the set of scenes has changed
+        keys = frozenset(self._cards_state)
+        if keys != getattr(self, '_storyboard_keys', None):
+            self._storyboard_keys = keys
+            self._storyboard_order = sorted(keys)
+        
+        # One directory listing per thumbnail folder instead of a stat per scene;
+        # the listing's mtimes key the thumbnail cache too
+        mtimes = _existing_mtimes(
+            {st.get('thumb') for st in self._cards_state.values() if st.get('thumb')}
+        )
+        
+        for scene_num in self._storyboard_order:
             st = self._cards_state[scene_num]
             prompt = st.get('tgt', st.get('vi', ''))
             thumb_path = st.get('thumb', '')
-            self.storyboard_view.add_scene(scene_num, thumb_path, prompt, st)
+            self.storyboard_view.add_scene(
+                scene_num, thumb_path, prompt, st,
+                thumbnail_exists=thumb_path in mtimes, thumbnail_mtime=mtimes.get(thumb_path)
+            )
     
     def _open_card_prompt_detail(self, item):
         """Open prompt detail dialog when double-clicking card"""
@@ -384,42 +498,7 @@ class StoryboardView(QWidget):
         dialog = QDialog(self)
         dialog.setWindowTitle(f"Prompts - Cảnh {scene_num}")
         dialog.setMinimumSize(750, 550)
-        dialog.setStyleSheet("""
-            QDialog {
-                background: #FAFAFA;
-            }
-            QLabel {
-                color: #212121;
-            }
-            QTextEdit {
-                background: white;
-                border: 2px solid #E0E0E0;
-                border-radius: 6px;
-                padding: 8px;
-                font-size: 11px;
-                color: #424242;
-            }
-            QPushButton {
-                background: white;
-                border: 2px solid #BDBDBD;
-                border-radius: 6px;
-                padding: 8px 16px;
-                font-size: 13px;
-                font-weight: 600;
-            }
-            QPushButton:hover {
-                background: #F5F5F5;
-                border: 2px solid #1E88E5;
-            }
-            QPushButton#btn_close {
-                background: #1E88E5;
-                border: 2px solid #1E88E5;
-                color: white;
-            }
-            QPushButton#btn_close:hover {
-                background: #1976D2;
-            }
-        """)
+        dialog.setStyleSheet(_PROMPT_DIALOG_QSS)
         
         layout = QVBoxLayout(dialog)
         layout.setSpacing(16)
@@ -503,87 +582,181 @@ class StoryboardView(QWidget):
                 QMessageBox.Ok
             )
 '''
+
+# Appended after each self.cards.addItem(it)
+_POPULATE_HOOK = '''
+        
+        # Mark storyboard stale; a visible storyboard is rebuilt once after
+        # the whole populate batch instead of once per scene (Issue #7)
+        self._schedule_storyboard_refresh()'''
+
+
+def _locate_anchors(content):
+    """Return {label: position} for every required anchor (-1 if missing)"""
+    return {label: content.find(anchor) for label, anchor in _REQUIRED_ANCHORS.items()}
+
+
+def _apply_body_edits(text, render_method, scenes_tab, populate_hook):
+    """
+    Apply the render/scenes-tab/populate edits to text in one left-to-right pass
+    
+    Each anchor is located with str.find; only the _render_card_text region is
+    matched with a regex, anchored at the hit so it never scans the whole file.
+    """
+    edits = []  # (start, end, replacement)
+    
+    pos = text.find(_RENDER_ANCHOR)
+    if pos != -1:
+        match = _OLD_RENDER_RE.match(text, pos)
+        if match:
+            edits.append((match.start(), match.end(), render_method))
+    
+    start = text.find(_SCENES_TAB_START)
+    if start != -1:
+        end = text.find(_SCENES_TAB_END, start)
+        if end != -1:
+            edits.append((start, end + len(_SCENES_TAB_END), scenes_tab))
+    
+    pos = text.find(_POPULATE_ANCHOR)
+    while pos != -1:
+        end = pos + len(_POPULATE_ANCHOR)
+        edits.append((pos, end, _POPULATE_ANCHOR + populate_hook))
+        pos = text.find(_POPULATE_ANCHOR, end)
+    
+    parts = []
+    cursor = 0
+    for start, end, replacement in sorted(edits):
+        if start < cursor:
+            continue  # overlaps an edit already applied
+        parts.append(text[cursor:start])
+        parts.append(replacement)
+        cursor = end
+    parts.append(text[cursor:])
+    return ''.join(parts)
+
+
+def patch_text2video_panel():
+    """Main patching function for ui/text2video_panel.py"""
     
-    # Find the last method of the class (before the end or before next class)
-    # Look for pattern like "    def _some_method" at the end
-    insert_pos = content.rfind("\n\nclass ")
-    if insert_pos == -1:
+    file_path = "ui/text2video_panel.py"
+    
+    if not os.path.exists(file_path):
+        print(f"❌ File not found: {file_path}")
+        print("   Please run this script from the project root directory")
+        return False
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # Validate the layout up front so a changed panel is never half-patched
+    anchors = _locate_anchors(content)
+    missing = [label for label, pos in anchors.items() if pos == -1]
+    if missing:
+        print(f"❌ {file_path} does not match the expected layout, nothing changed.")
+        print("   Missing anchors:")
+        for label in missing:
+            print(f"   • {label}")
+        return False
+    
+    # Backup original file
+    backup_file(file_path)
+    
+    print(f"📝 Patching {file_path}...")
+    
+    # Collect module-level imported names once from the original source, so
+    # the import steps below are set lookups rather than full-file scans
+    imported = {
+        name
+        for stmt in _IMPORT_STMT_RE.findall(content)
+        for name in _NAME_RE.findall(stmt)
+    }
+    
+    # ========================================
+    # STEP 1: Add StoryboardView class at the beginning (after imports)
+    # ========================================
+    
+    # Insert after imports, before CollapsibleGroupBox
+    insert_pos = anchors['StoryboardView insertion point (class CollapsibleGroupBox)']
+    
+    # New methods go before the last class definition (or at end of file).
+    # Split the source once at both anchors and re-join the pieces at the end
+    # instead of rebuilding the whole file after every insertion.
+    tail_pos = content.rfind("\n\nclass ")
+    if tail_pos == -1:
         # No other class found, add before end of file
-        insert_pos = len(content)
+        tail_pos = len(content)
+    tail_pos = max(tail_pos, insert_pos)
     
-    content = content[:insert_pos] + new_methods + "\n\n" + content[insert_pos:]
-    print("✅ Added new methods (_switch_view, _refresh_storyboard, _show_prompt_detail, _copy_to_clipboard)")
+    head = content[:insert_pos]
+    body = [content[insert_pos:tail_pos], content[tail_pos:]]
+    print("✅ Added StoryboardView class")
     
     # ========================================
+    # STEP 2: Update _render_card_text() method
+    # STEP 3: Add toggle buttons and storyboard view in scenes tab
+    # STEP 4: Add new methods at the end of class (joined in below)
     # STEP 5: Update scene population logic to refresh storyboard
     # ========================================
     
-    # Find where cards are populated (around line 1000-1025)
-    populate_pattern = r'(self\.cards\.addItem\(it\))'
-    populate_replacement = r'''\1
-        
-        # Also refresh storyboard if visible (Issue #7)
-        if hasattr(self, 'view_stack') and self.view_stack.currentIndex() == 1:
-            self._refresh_storyboard()'''
-    
-    content = re.sub(populate_pattern, populate_replacement, content)
+    # Steps 2, 3 and 5 are applied together in a single sweep per chunk
+    body = [
+        _apply_body_edits(part, _NEW_RENDER_METHOD, _NEW_SCENES_TAB, _POPULATE_HOOK)
+        for part in body
+    ]
+    print("✅ Updated _render_card_text() method")
+    print("✅ Added toggle buttons and storyboard view")
+    print("✅ Added new methods (_switch_view, _refresh_storyboard, _show_prompt_detail, _copy_to_clipboard)")
     print("✅ Updated scene population to refresh storyboard")
     
     # ========================================
-    # STEP 6: Add pyqtSignal import if not present
+    # STEP 6: Add pyqtSignal/QTimer imports if not present
     # ========================================
     
-    if 'pyqtSignal' not in content:
+    missing_core = [name for name in ('pyqtSignal', 'QTimer') if name not in imported]
+    if missing_core:
         # Find QtCore import line
-        import_pattern = r'(from PyQt5\.QtCore import[^)]+)'
-        
-        def add_pyqtsignal(match):
-            imports = match.group(1)
-            if 'pyqtSignal' not in imports:
-                # Add before the closing parenthesis or at the end
-                if ')' in imports:
-                    imports = imports.replace(')', ', pyqtSignal)')
-                else:
-                    imports += ', pyqtSignal'
-            return imports
+        def add_qtcore(match):
+            return match.group(1) + ''.join(f', {name}' for name in missing_core)
         
-        content = re.sub(import_pattern, add_pyqtsignal, content)
-        print("✅ Added pyqtSignal import")
+        head = _QTCORE_IMPORT_RE.sub(add_qtcore, head, count=1)
+        print(f"✅ Added {', '.join(missing_core)} import")
     
     # ========================================
-    # STEP 7: Add QStackedWidget and QPixmap imports if not present
+    # STEP 7: Add QStackedWidget and QPixmap/QPixmapCache imports if not present
     # ========================================
     
-    if 'QStackedWidget' not in content:
-        widgets_import_pattern = r'(from PyQt5\.QtWidgets import \([^)]+)\)'
-        
+    if 'QStackedWidget' not in imported:
         def add_qstackedwidget(match):
-            imports = match.group(1)
-            if 'QStackedWidget' not in imports:
-                imports += ',\n    QStackedWidget'
-            return imports + ')'
+            imports = match.group(1).rstrip()
+            if not imports.endswith((',', '(')):
+                imports += ','
+            return imports + '\n    QStackedWidget,\n)'
         
-        content = re.sub(widgets_import_pattern, add_qstackedwidget, content, count=1)
+        head = _QTWIDGETS_IMPORT_RE.sub(add_qstackedwidget, head, count=1)
         print("✅ Added QStackedWidget import")
     
-    if 'QPixmap' not in content:
-        gui_import_pattern = r'(from PyQt5\.QtGui import[^)]+)'
-        
-        def add_qpixmap(match):
-            imports = match.group(1)
-            if 'QPixmap' not in imports:
-                if ')' in imports:
-                    imports = imports.replace(')', ', QPixmap)')
-                else:
-                    imports += ', QPixmap'
-            return imports
-        
-        content = re.sub(gui_import_pattern, add_qpixmap, content)
-        print("✅ Added QPixmap import")
-    
-    # Write patched content
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    missing_gui = [name for name in ('QPixmap', 'QPixmapCache') if name not in imported]
+    if missing_gui:
+        def add_qtgui(match):
+            return match.group(1) + ''.join(f', {name}' for name in missing_gui)
+        
+        head = _QTGUI_IMPORT_RE.sub(add_qtgui, head, count=1)
+        print(f"✅ Added {', '.join(missing_gui)} import")
+    
+    content = ''.join([head, _STORYBOARD_CLASS, "\n\n", body[0], _NEW_METHODS, "\n\n", body[1]])
+    
+    # Write patched content to a temp file next to the target and swap it in
+    # atomically, so an interrupted run never leaves a truncated panel file
+    tmp_path = f"{file_path}.tmp.{os.getpid()}"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.write(content)
+        os.replace(tmp_path, file_path)
+    except OSError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"❌ Could not write {file_path}: {e}")
+        return False
     
     print(f"\n✅ Successfully patched {file_path}")
     print(f"   Total changes: ~400 lines added/modified")
@@ -635,7 +808,7 @@ def main():
         return 0
     else:
         print("\n❌ Patching failed. Please check errors above.")
-        print("   Original file backup created with .backup_YYYYMMDD_HHMMSS suffix")
+        print("   Any backup made is saved with a .backup_YYYYMMDD_HHMMSS suffix")
         return 1
 
 
@@ -4,71 +4,91 @@ Check if all V5 files exist
 """
 
 import os
-from pathlib import Path
+import sys
+from collections import defaultdict
+
+REQUIRED_FILES = (
+    # V5 Panels
+    "ui/image2video_panel_v5_connected.py",
+    "ui/text2video_panel_v5_connected.py",
+    "ui/video_ads_panel_v5_connected.py",
+    
+    # V3 Settings (fallback)
+    "ui/settings_panel_v3_compact.py",
+    
+    # Widgets
+    "ui/widgets/accordion.py",
+    "ui/widgets/compact_button.py",
+    "ui/widgets/responsive_utils.py",
+    "ui/widgets/key_list_v2.py",
+    
+    # Styles
+    "ui/styles/light_theme_v2.py",
+    "ui/styles/main_tab_style.py",
+    
+    # Main
+    "main_image2video.py",
+)
+
+
+def _group_by_dir(files):
+    """Group relative paths as ((dir, frozenset(names)), ...)"""
+    by_dir = defaultdict(set)
+    for file_path in files:
+        dir_name, name = os.path.split(file_path)
+        by_dir[dir_name].add(name)
+    return tuple((d, frozenset(names)) for d, names in by_dir.items())
+
+
+_FILES_BY_DIR = _group_by_dir(REQUIRED_FILES)
+
 
 def check_files():
     """Check if all required V5 files exist"""
     
-    repo_root = Path(__file__).parent
+    root_str = os.path.dirname(os.path.abspath(__file__))
+    required_files = REQUIRED_FILES
     
-    required_files = [
-        # V5 Panels
-        "ui/image2video_panel_v5_connected.py",
-        "ui/text2video_panel_v5_connected.py",
-        "ui/video_ads_panel_v5_connected.py",
-        
-        # V3 Settings (fallback)
-        "ui/settings_panel_v3_compact.py",
-        
-        # Widgets
-        "ui/widgets/accordion.py",
-        "ui/widgets/compact_button.py",
-        "ui/widgets/responsive_utils.py",
-        "ui/widgets/key_list_v2.py",
-        
-        # Styles
-        "ui/styles/light_theme_v2.py",
-        "ui/styles/main_tab_style.py",
-        
-        # Main
-        "main_image2video.py",
-    ]
+    # Collect all report lines and write them in one go at the end
+    out = ["=" * 70, "🔍 CHECKING V5 FILES", "=" * 70, ""]
     
-    print("=" * 70)
-    print("🔍 CHECKING V5 FILES")
-    print("=" * 70)
-    print()
+    # List each parent directory once instead of stat'ing every file
+    found = set()
+    for dir_name, names in _FILES_BY_DIR:
+        try:
+            with os.scandir(os.path.join(root_str, dir_name)) as entries:
+                present = {e.name for e in entries if e.is_file()}
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        found.update(f"{dir_name}/{n}" if dir_name else n for n in names & present)
     
     missing = []
     existing = []
     
     for file_path in required_files:
-        full_path = repo_root / file_path
-        if full_path.exists():
-            print(f"✅ {file_path}")
+        if file_path in found:
+            out.append(f"✅ {file_path}")
             existing.append(file_path)
         else:
-            print(f"❌ {file_path}")
+            out.append(f"❌ {file_path}")
             missing.append(file_path)
     
-    print()
-    print("=" * 70)
-    print(f"📊 SUMMARY: {len(existing)}/{len(required_files)} files found")
-    print("=" * 70)
+    out += [
+        "",
+        "=" * 70,
+        f"📊 SUMMARY: {len(existing)}/{len(required_files)} files found",
+        "=" * 70,
+    ]
     
     if missing:
-        print()
-        print("❌ MISSING FILES:")
-        for f in missing:
-            print(f"   • {f}")
-        print()
-        print("Please create these files before running the application.")
-        return False
+        out += ["", "❌ MISSING FILES:"]
+        out.extend(f"   • {f}" for f in missing)
+        out += ["", "Please create these files before running the application."]
     else:
-        print()
-        print("✅ ALL FILES EXIST!")
-        print("You can now run: python main_image2video.py")
-        return True
+        out += ["", "✅ ALL FILES EXIST!", "You can now run: python main_image2video.py"]
+    
+    sys.stdout.write("\n".join(out) + "\n")
+    return not missing
 
 if __name__ == "__main__":
     success = check_files()
@@ -5,182 +5,528 @@ Simple script to add Storyboard view to Text2Video panel
 Just adds the missing features without complex regex
 """
 
+import io
+import mmap
 import os
+import re
 import shutil
-from datetime import datetime
+import time
 
+# patch_file() scanner states
+_COPY = 0               # copy lines through, looking for edit sites
+_IN_WIDGETS_IMPORT = 1  # inside the parenthesised QtWidgets import list
+_SKIP_SCENES_TAB = 2    # dropping the old scenes tab setup
+_SKIP_RENDER = 3        # dropping the old _render_card_text body
+_IN_JOB_CARD = 4        # inside _on_job_card, looking for the video update loop
 
-def backup_file(filepath):
-    """Create timestamped backup"""
-    backup = f"{filepath}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    shutil.copy2(filepath, backup)
-    print(f"✅ Backup created: {backup}")
-    return backup
+# One scanner for every edit site, anchored at line starts of the mapped
+# file; the name of the matching group says which site the line is.
+# Lines that match no group are copied through without being decoded.
+_SCAN_RE = re.compile(
+    rb'^(?:(?P<widgets>from PyQt5\.QtWidgets import)'
+    rb'|(?P<collapsible>class CollapsibleGroupBox)'
+    rb'|(?P<cls>class )'
+    rb'|[ \t]+(?:(?P<tab3># Tab 3: Scene Results)|(?P<render>def _render_card_text\(self)'
+    rb'|(?P<jobcard>def _on_job_card\(self))'
+    rb'|(?P<top>[^\s#]))',
+    re.M
+)
+# Scanner groups that mean "module-level statement"
+_TOP_LEVEL_KINDS = frozenset(('widgets', 'collapsible', 'cls', 'top'))
 
+# QtWidgets names the emitted code needs
+_EXTRA_WIDGETS = ('QStackedWidget', 'QDialog', 'QGridLayout')
 
-def create_storyboard_additions():
-    """Create the code additions needed"""
+# Replacement for the old scenes tab setup (emitted after '# Tab 3: Scene Results')
+_SCENES_TAB_BLOCK = '''        scenes_widget = QWidget()
+        scenes_layout = QVBoxLayout(scenes_widget)
+        scenes_layout.setContentsMargins(4, 4, 4, 4)
+
+        # Toggle buttons
+        toggle_widget = QWidget()
+        toggle_layout = QHBoxLayout(toggle_widget)
+        toggle_layout.setContentsMargins(8, 8, 8, 8)
+        toggle_layout.setSpacing(8)
+
+        self.btn_view_card = QPushButton("📇 Card")
+        self.btn_view_card.setCheckable(True)
+        self.btn_view_card.setChecked(True)
+        self.btn_view_card.setFixedHeight(34)
+        self.btn_view_card.setFixedWidth(100)
+        self.btn_view_card.setStyleSheet("""
+            QPushButton {
+                background: white;
+                border: 2px solid #BDBDBD;
+                border-radius: 6px;
+                font-size: 13px;
+                font-weight: 600;
+            }
+            QPushButton:checked {
+                background: #1E88E5;
+                border: 2px solid #1E88E5;
+                color: white;
+            }
+            QPushButton:hover { border: 2px solid #1E88E5; }
+        """)
+        self.btn_view_card.clicked.connect(lambda: self._switch_view("card"))
+
+        self.btn_view_storyboard = QPushButton("📊 Storyboard")
+        self.btn_view_storyboard.setCheckable(True)
+        self.btn_view_storyboard.setFixedHeight(34)
+        self.btn_view_storyboard.setFixedWidth(120)
+        self.btn_view_storyboard.setStyleSheet(self.btn_view_card.styleSheet())
+        self.btn_view_storyboard.clicked.connect(lambda: self._switch_view("storyboard"))
+
+        toggle_layout.addWidget(self.btn_view_card)
+        toggle_layout.addWidget(self.btn_view_storyboard)
+        toggle_layout.addStretch()
+        scenes_layout.addWidget(toggle_widget)
+
+        # Stacked widget
+        from PyQt5.QtWidgets import QStackedWidget
+        self.view_stack = QStackedWidget()
+
+        # Card view
+        self.cards = QListWidget()
+        self.cards.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.cards.setIconSize(QSize(240, 135))
+        # Lay rows out in chunks so a full refill doesn't block on one pass.
+        # Row heights follow the card text, so sizes are not uniform.
+        self.cards.setLayoutMode(QListWidget.Batched)
+        self.cards.setBatchSize(30)
+        self._static_text_cache = {}
+        self.cards.setItemDelegate(_CardTextDelegate(self._static_text_cache, self.cards))
+        self.cards.itemDoubleClicked.connect(self._open_card_prompt_detail)
+        self.view_stack.addWidget(self.cards)
+
+        # Storyboard view
+        self.storyboard_view = StoryboardView(self)
+        self.storyboard_view.scene_clicked.connect(self._show_prompt_detail)
+        self.view_stack.addWidget(self.storyboard_view)
+
+        scenes_layout.addWidget(self.view_stack)
+'''
+
+# StoryboardView and its helpers, inserted after CollapsibleGroupBox
+_STORYBOARD_CLASS = r'''
+
+from PyQt5.QtCore import QEvent, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap, QPixmapCache, QStaticText, QTransform
+from PyQt5.QtWidgets import QStyle, QStyledItemDelegate, QStyleOptionViewItem
+
+# Scaled thumbnails live in Qt's process-wide pixmap cache (limit is in KB)
+QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), 65536))
+
+# HTML fragments for _render_card_text
+_CARD_TITLE_TMPL = '<b style="font-size:14px; color:#1E88E5;">🎬 Cảnh {}</b>'
+_CARD_SEP = '━━━━━━━━━━━━━━━━━━━━'
+_CARD_PROMPT_HDR = '<span style="font-size:11px; font-weight:600;">📝 PROMPT:</span>'
+_CARD_PROMPT_TMPL = '<span style="font-size:11px; color:#424242;">{}</span>'
+_CARD_VIDEO_HDR = '<span style="font-size:11px; font-weight:600;">🎥 VIDEO:</span>'
+_CARD_VIDEO_TMPL = '<span style="font-size:10px; color:#616161;">  #{}: {}{}</span>'
+_CARD_FILE_TMPL = '<span style="font-size:10px; color:#757575;">  📥 {}</span>'
+
+
+def _thumb_key(path, w, h):
+    """Cache key for path scaled to w x h, or None if the file is missing"""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    return f"{path}|{int(mtime)}|{w}x{h}"
+
+
+def _video_counts(vids):
+    """(completed, total) for a scene's videos dict"""
+    return sum(v.get('status', '') == 'completed' for v in vids.values()), len(vids)
+
+
+def _cached_pixmap(key):
+    """Return the cached scaled pixmap for key, or None"""
+    pix = QPixmapCache.find(key)
+    if pix is None or pix.isNull():
+        return None
+    return pix
+
+
+def _store_pixmap(key, pix):
+    QPixmapCache.insert(key, pix)
+
+
+class _ThumbSignals(QObject):
+    loaded = pyqtSignal(int, str, QImage)  # scene_num, cache key, scaled image
+
+
+class _ThumbLoader(QRunnable):
+    """Decode + scale a thumbnail off the GUI thread (QImage is thread-safe, QPixmap is not)"""
+    
+    def __init__(self, scene_num, path, size, key, signals):
+        super().__init__()
+        self.scene_num = scene_num
+        self.path = path
+        self.size = size
+        self.key = key
+        self.signals = signals
+    
+    def run(self):
+        img = QImage(self.path)
+        if not img.isNull():
+            w, h = self.size
+            img = img.scaled(w, h, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.signals.loaded.emit(self.scene_num, self.key, img)
+
+
+class _CardTextDelegate(QStyledItemDelegate):
+    """
+    Paints the HTML from _render_card_text via cached QStaticText
+    
+    Layout is prepared once per scene and reused on every repaint; an entry
+    is rebuilt only when the card HTML or the available width changes.
+    """
     
-    # 1. StoryboardView class to add after CollapsibleGroupBox
-    storyboard_class = '''
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self._cache = cache  # scene -> (html, width, QStaticText)
+    
+    def _static_text(self, scene, html, width, font):
+        entry = self._cache.get(scene)
+        if entry is not None and entry[0] == html and entry[1] == width:
+            return entry[2]
+        st = QStaticText(html)
+        st.setTextFormat(Qt.RichText)
+        st.setTextWidth(width)
+        st.prepare(QTransform(), font)
+        self._cache[scene] = (html, width, st)
+        return st
+    
+    @staticmethod
+    def _scene_of(index):
+        role = index.data(Qt.UserRole)
+        if isinstance(role, tuple) and len(role) > 1:
+            return role[1]
+        return index.row()
+    
+    def _text_rect(self, opt):
+        left = 4
+        if not opt.icon.isNull():
+            left += opt.decorationSize.width() + 8
+        return opt.rect.adjusted(left, 4, -4, -4)
+    
+    def paint(self, painter, option, index):
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        html = opt.text
+        opt.text = ""
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+        
+        rect = self._text_rect(opt)
+        st = self._static_text(self._scene_of(index), html, rect.width(), opt.font)
+        painter.save()
+        painter.setClipRect(rect)
+        painter.drawStaticText(rect.topLeft(), st)
+        painter.restore()
+    
+    def sizeHint(self, option, index):
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        base = super().sizeHint(option, index)
+        if opt.widget is not None:
+            opt.rect.setWidth(opt.widget.viewport().width())
+        rect = self._text_rect(opt)
+        st = self._static_text(self._scene_of(index), opt.text, rect.width(), opt.font)
+        base.setHeight(max(base.height(), int(st.size().height()) + 8))
+        return base
 
-from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtGui import QPixmap
 
 class StoryboardView(QWidget):
-    """Grid view for scenes - 3 columns, light theme"""
+    """Grid view for scenes - 3 columns, light theme
+    
+    Virtualized: only rows near the viewport have card widgets; cards that
+    scroll out of range go back to a pool and are re-bound to other scenes.
+    """
     
     scene_clicked = pyqtSignal(int)
     
+    COLUMNS = 3
+    CARD_W, CARD_H = 260, 240
+    SPACING = 16
+    MARGIN = 16
+    
+    _SMALL_FONT = None  # shared by every card; created once a QApplication exists
+    
+    # Applied once on the view; cards and labels pick it up via object names
+    _STYLE = """
+        QScrollArea, QWidget#storyboardGrid {
+            background: #FAFAFA;
+            border: none;
+        }
+        QFrame#sceneCard {
+            background: white;
+            border: 2px solid #E0E0E0;
+            border-radius: 8px;
+        }
+        QFrame#sceneCard:hover {
+            border: 2px solid #1E88E5;
+            background: #F8FCFF;
+        }
+        QLabel#sceneThumb {
+            background: #F5F5F5;
+            border: 1px solid #E0E0E0;
+            border-radius: 6px;
+            color: #9E9E9E;
+            font-size: 11px;
+        }
+        QLabel#sceneDesc {
+            color: #757575;
+        }
+        QLabel#sceneStatus {
+            color: #4CAF50;
+            font-weight: bold;
+        }
+    """
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.setStyleSheet(self._STYLE)
+        if StoryboardView._SMALL_FONT is None:
+            StoryboardView._SMALL_FONT = QFont("Segoe UI", 9)
         
         # Scroll container
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setFrameShape(QFrame.NoFrame)
-        scroll.setStyleSheet("background: #FAFAFA; border: none;")
-        
-        # Grid container
-        container = QWidget()
-        self.grid = QGridLayout(container)
-        self.grid.setSpacing(16)
-        self.grid.setContentsMargins(16, 16, 16, 16)
-        self.grid.setAlignment(Qt.AlignTop)
-        
-        scroll.setWidget(container)
+        self.scroll = QScrollArea()
+        self.scroll.setWidgetResizable(True)
+        self.scroll.setFrameShape(QFrame.NoFrame)
+        
+        # Grid container; cards are placed on it by position, not by a layout
+        self.canvas = QWidget()
+        self.canvas.setObjectName("storyboardGrid")
+        # The #FAFAFA storyboardGrid rule paints the gaps between cards. Not
+        # WA_OpaquePaintEvent: that would skip this styled background, and
+        # nothing else fills the canvas
+        self.canvas.setAttribute(Qt.WA_StyledBackground, True)
+        # Card clicks propagate up to the canvas; one filter maps them to scenes
+        self.canvas.installEventFilter(self)
+        
+        self.scroll.setWidget(self.canvas)
         
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
-        layout.addWidget(scroll)
+        layout.addWidget(self.scroll)
+        
+        self._scenes = {}     # scene_num -> (thumb_path, prompt, state)
+        self.cards = {}       # scene_num -> card currently shown for it
+        self._card_pool = []  # hidden cards ready to be re-bound
+        self._card_to_scene = {}  # shown card -> scene_num
+        
+        # Re-evaluate the visible rows at most once per frame while scrolling
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(16)
+        self._visible_timer.timeout.connect(self._update_visible)
+        self.scroll.verticalScrollBar().valueChanged.connect(self._visible_timer.start)
         
-        self.cards = {}
+        # Thumbnails are decoded on QThreadPool and delivered back here
+        self._thumb_signals = _ThumbSignals(self)
+        self._thumb_signals.loaded.connect(self._on_thumb_loaded)
+        self._thumb_targets = {}  # scene_num -> (cache key, QLabel) awaiting a load
     
     def add_scene(self, scene_num, thumb_path, prompt, state):
-        """Add scene card to grid"""
-        row = (scene_num - 1) // 3
-        col = (scene_num - 1) % 3
-        
-        card = QFrame()
-        card.setFixedSize(260, 240)
+        """Add scene to grid; its card is built once it scrolls into view"""
+        self._scenes[scene_num] = (thumb_path, prompt, state)
+        rows = (max(self._scenes) - 1) // self.COLUMNS + 1
+        self.canvas.setMinimumSize(
+            2 * self.MARGIN + self.COLUMNS * self.CARD_W + (self.COLUMNS - 1) * self.SPACING,
+            2 * self.MARGIN + rows * self.CARD_H + (rows - 1) * self.SPACING,
+        )
+        self._visible_timer.start()
+    
+    def clear(self):
+        """Clear all cards"""
+        # Hold repaints until every card is gone, unless a caller is already batching
+        batch = self.updatesEnabled()
+        if batch:
+            self.setUpdatesEnabled(False)
+        try:
+            for scene_num in list(self.cards):
+                self._release_card(scene_num)
+        finally:
+            if batch:
+                self.setUpdatesEnabled(True)
+        self._scenes.clear()
+        self.canvas.setMinimumSize(0, 0)
+        # Results still in flight for removed cards are dropped on arrival
+        self._thumb_targets.clear()
+    
+    def eventFilter(self, obj, event):
+        if obj is self.canvas and event.type() == QEvent.MouseButtonPress:
+            child = self.canvas.childAt(event.pos())
+            while child is not None and child.parentWidget() is not self.canvas:
+                child = child.parentWidget()
+            scene_num = self._card_to_scene.get(child)
+            if scene_num is not None:
+                self.scene_clicked.emit(scene_num)
+                return True
+        return super().eventFilter(obj, event)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._visible_timer.start()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._visible_timer.start()
+    
+    def _update_visible(self):
+        """Bind cards for rows intersecting the viewport (plus one row each side)"""
+        top = self.scroll.verticalScrollBar().value()
+        height = self.scroll.viewport().height()
+        pitch = self.CARD_H + self.SPACING
+        first_row = max(0, (top - self.MARGIN) // pitch - 1)
+        last_row = (top + height - self.MARGIN) // pitch + 1
+        
+        wanted = {n for n in self._scenes
+                  if first_row <= (n - 1) // self.COLUMNS <= last_row}
+        for scene_num in [n for n in self.cards if n not in wanted]:
+            self._release_card(scene_num)
+        for scene_num in sorted(wanted.difference(self.cards)):
+            card = self._card_pool.pop() if self._card_pool else self._make_card()
+            self._bind_card(card, scene_num)
+            row, col = divmod(scene_num - 1, self.COLUMNS)
+            card.move(self.MARGIN + col * (self.CARD_W + self.SPACING),
+                      self.MARGIN + row * pitch)
+            card.show()
+            self.cards[scene_num] = card
+    
+    def _release_card(self, scene_num):
+        card = self.cards.pop(scene_num)
+        card.hide()
+        del self._card_to_scene[card]
+        self._thumb_targets.pop(scene_num, None)
+        self._card_pool.append(card)
+    
+    def _make_card(self):
+        """Build an unbound card; _bind_card fills it in"""
+        card = QFrame(self.canvas)
+        card.setFixedSize(self.CARD_W, self.CARD_H)
         card.setCursor(Qt.PointingHandCursor)
-        card.setStyleSheet("""
-            QFrame {
-                background: white;
-                border: 2px solid #E0E0E0;
-                border-radius: 8px;
-            }
-            QFrame:hover {
-                border: 2px solid #1E88E5;
-                background: #F8FCFF;
-            }
-        """)
+        card.setObjectName("sceneCard")
+        # Fixed-size card: nothing to repaint when its geometry is re-set.
+        # Not opaque - the rounded corners show the grid through.
+        card.setAttribute(Qt.WA_StaticContents, True)
         
         layout = QVBoxLayout(card)
         layout.setSpacing(8)
         layout.setContentsMargins(8, 8, 8, 8)
         
         # Thumbnail
-        thumb = QLabel()
-        thumb.setFixedSize(242, 136)
-        thumb.setAlignment(Qt.AlignCenter)
-        thumb.setStyleSheet("""
-            background: #F5F5F5;
-            border: 1px solid #E0E0E0;
-            border-radius: 6px;
-            color: #9E9E9E;
-            font-size: 11px;
-        """)
-        
-        if thumb_path and os.path.exists(thumb_path):
-            pix = QPixmap(thumb_path).scaled(242, 136, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            thumb.setPixmap(pix)
-        else:
-            thumb.setText("🖼️\\nChưa tạo ảnh")
-        
-        layout.addWidget(thumb)
+        card.thumb = QLabel()
+        card.thumb.setFixedSize(242, 136)
+        card.thumb.setAlignment(Qt.AlignCenter)
+        card.thumb.setObjectName("sceneThumb")
+        layout.addWidget(card.thumb)
         
         # Title
-        title = QLabel(f"<b style='color:#1E88E5; font-size:13px;'>🎬 Cảnh {scene_num}</b>")
-        title.setAlignment(Qt.AlignCenter)
-        layout.addWidget(title)
+        card.title = QLabel()
+        card.title.setAlignment(Qt.AlignCenter)
+        layout.addWidget(card.title)
         
         # Prompt preview
-        preview = prompt[:50] + "..." if len(prompt) > 50 else prompt
-        desc = QLabel(preview)
-        desc.setWordWrap(True)
-        desc.setAlignment(Qt.AlignCenter)
-        desc.setFont(QFont("Segoe UI", 9))
-        desc.setStyleSheet("color: #757575;")
-        desc.setMaximumHeight(40)
-        layout.addWidget(desc)
+        card.desc = QLabel()
+        card.desc.setWordWrap(True)
+        card.desc.setAlignment(Qt.AlignCenter)
+        card.desc.setFont(self._SMALL_FONT)
+        card.desc.setObjectName("sceneDesc")
+        card.desc.setMaximumHeight(40)
+        layout.addWidget(card.desc)
         
         # Video status
+        card.status = QLabel()
+        card.status.setAlignment(Qt.AlignCenter)
+        card.status.setFont(self._SMALL_FONT)
+        card.status.setObjectName("sceneStatus")
+        layout.addWidget(card.status)
+        return card
+    
+    def _bind_card(self, card, scene_num):
+        """Point a (new or recycled) card at scene_num"""
+        thumb_path, prompt, state = self._scenes[scene_num]
+        self._card_to_scene[card] = scene_num
+        
+        thumb = card.thumb
+        thumb.setText("🖼️\nChưa tạo ảnh")
+        key = _thumb_key(thumb_path, 242, 136) if thumb_path else None
+        if key is not None:
+            pix = _cached_pixmap(key)
+            if pix is not None:
+                thumb.setPixmap(pix)
+            else:
+                # Placeholder stays until the worker delivers the image
+                self._thumb_targets[scene_num] = (key, thumb)
+                QThreadPool.globalInstance().start(
+                    _ThumbLoader(scene_num, thumb_path, (242, 136), key, self._thumb_signals)
+                )
+        
+        card.title.setText(f"<b style='color:#1E88E5; font-size:13px;'>🎬 Cảnh {scene_num}</b>")
+        card.desc.setText(prompt[:50] + "..." if len(prompt) > 50 else prompt)
+        
         vids = state.get('videos', {})
         if vids:
-            completed = sum(1 for v in vids.values() if v.get('status') == 'completed')
-            total = len(vids)
-            status = QLabel(f"🎥 {completed}/{total} videos")
-            status.setAlignment(Qt.AlignCenter)
-            status.setFont(QFont("Segoe UI", 9))
-            status.setStyleSheet("color: #4CAF50; font-weight: bold;")
-            layout.addWidget(status)
-        
-        card.scene_num = scene_num
-        card.mousePressEvent = lambda e: self.scene_clicked.emit(scene_num)
-        
-        self.grid.addWidget(card, row, col)
-        self.cards[scene_num] = card
-    
-    def clear(self):
-        """Clear all cards"""
-        while self.grid.count():
-            item = self.grid.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        self.cards.clear()
+            # Kept up to date by _on_job_card; counted here only for older state
+            completed, total = state.get('_video_counts') or _video_counts(vids)
+            card.status.setText(f"🎥 {completed}/{total} videos")
+        card.status.setVisible(bool(vids))
+    
+    def _on_thumb_loaded(self, scene_num, key, img):
+        """GUI-thread slot: cache the decoded thumbnail and show it if its card still exists"""
+        pix = None if img.isNull() else QPixmap.fromImage(img)
+        if pix is not None:
+            _store_pixmap(key, pix)
+        
+        target = self._thumb_targets.get(scene_num)
+        if target is None or target[0] != key:
+            return
+        del self._thumb_targets[scene_num]
+        if pix is not None:
+            target[1].setPixmap(pix)
 '''
-    
-    # 2. New _render_card_text method
-    render_method = '''    def _render_card_text(self, scene):
+
+# Replacement _render_card_text method
+_RENDER_METHOD = r'''    def _render_card_text(self, scene):
         """Render card text with HTML formatting - Issue #7"""
+        # Cached QStaticText layout for this card is stale from here on
+        getattr(self, '_static_text_cache', {}).pop(scene, None)
         st = self._cards_state.get(scene, {})
         vi = st.get('vi', '').strip()
         tgt = st.get('tgt', '').strip()
         
         # Bold blue title (14px)
-        lines = ['<b style="font-size:14px; color:#1E88E5;">🎬 Cảnh ' + str(scene) + '</b>']
-        lines.append('━━━━━━━━━━━━━━━━━━━━')
+        lines = [_CARD_TITLE_TMPL.format(scene), _CARD_SEP]
         
         # Prompt (11px, max 150 chars)
-        if tgt or vi:
-            lines.append('<span style="font-size:11px; font-weight:600;">📝 PROMPT:</span>')
-            prompt = (tgt or vi)[:150]
-            if len(tgt or vi) > 150:
-                prompt += '...'
-            lines.append('<span style="font-size:11px; color:#424242;">' + prompt + '</span>')
+        text = tgt or vi
+        if text:
+            prompt = text[:150] + '...' if len(text) > 150 else text
+            lines.append(_CARD_PROMPT_HDR)
+            lines.append(_CARD_PROMPT_TMPL.format(prompt))
         
         # Videos
         vids = st.get('videos', {})
         if vids:
             lines.append('')
-            lines.append('<span style="font-size:11px; font-weight:600;">🎥 VIDEO:</span>')
+            lines.append(_CARD_VIDEO_HDR)
             for copy, info in sorted(vids.items()):
-                status = info.get('status', '?')
-                tag = '<span style="font-size:10px; color:#616161;">  #' + str(copy) + ': ' + status
-                if info.get('completed_at'):
-                    tag += ' — ' + info['completed_at']
-                tag += '</span>'
-                lines.append(tag)
+                done = info.get('completed_at')
+                lines.append(_CARD_VIDEO_TMPL.format(
+                    copy, info.get('status', '?'), f' — {done}' if done else ''))
                 
                 if info.get('path'):
-                    lines.append('<span style="font-size:10px; color:#757575;">  📥 ' + os.path.basename(info['path']) + '</span>')
+                    lines.append(_CARD_FILE_TMPL.format(os.path.basename(info['path'])))
         
         return '<br>'.join(lines)
 '''
-    
-    # 3. Methods to add at end of class
-    new_methods = '''
+
+# Methods added at the end of the panel class
+_NEW_METHODS = r'''
     def _switch_view(self, view_type):
         """Switch between Card and Storyboard views"""
         if view_type == 'card':
@@ -195,12 +541,18 @@ class StoryboardView(QWidget):
     
     def _refresh_storyboard(self):
         """Refresh storyboard with current scenes"""
-        self.storyboard_view.clear()
-        for scene_num in sorted(self._cards_state.keys()):
-            st = self._cards_state[scene_num]
-            prompt = st.get('tgt', st.get('vi', ''))
-            thumb = st.get('thumb', '')
-            self.storyboard_view.add_scene(scene_num, thumb, prompt, st)
+        view = self.storyboard_view
+        # One relayout/repaint for the whole batch instead of one per card
+        view.setUpdatesEnabled(False)
+        try:
+            view.clear()
+            for scene_num in sorted(self._cards_state.keys()):
+                st = self._cards_state[scene_num]
+                prompt = st.get('tgt', st.get('vi', ''))
+                thumb = st.get('thumb', '')
+                view.add_scene(scene_num, thumb, prompt, st)
+        finally:
+            view.setUpdatesEnabled(True)  # also schedules the repaint
     
     def _open_card_prompt_detail(self, item):
         """Open detail dialog on double-click"""
@@ -215,8 +567,25 @@ class StoryboardView(QWidget):
         """Show prompt detail dialog"""
         st = self._cards_state.get(scene_num, {})
         
+        # Built on first use, then only refilled
+        if getattr(self, '_detail_dialog', None) is None:
+            self._build_detail_dialog()
+        
+        self._detail_scene = scene_num
+        self._detail_dialog.setWindowTitle(f"Prompts - Cảnh {scene_num}")
+        self._detail_title.setText(f"<b style='font-size:16px; color:#1E88E5;'>📝 Prompts cho Cảnh {scene_num}</b>")
+        self._detail_ed_img.setPlainText(st.get('vi', '(Không có)'))
+        self._detail_ed_vid.setPlainText(st.get('tgt', '(Không có)'))
+        
+        self._detail_dialog.exec_()
+    
+    def _detail_prompt(self, key):
+        """Prompt text of the scene shown in the detail dialog"""
+        return self._cards_state.get(self._detail_scene, {}).get(key, '')
+    
+    def _build_detail_dialog(self):
+        """Create the reusable prompt detail dialog"""
         dialog = QDialog(self)
-        dialog.setWindowTitle(f"Prompts - Cảnh {scene_num}")
         dialog.setMinimumSize(750, 550)
         dialog.setStyleSheet("""
             QDialog { background: #FAFAFA; }
@@ -250,33 +619,31 @@ class StoryboardView(QWidget):
         layout.setContentsMargins(20, 20, 20, 20)
         
         # Title
-        title = QLabel(f"<b style='font-size:16px; color:#1E88E5;'>📝 Prompts cho Cảnh {scene_num}</b>")
-        layout.addWidget(title)
+        self._detail_title = QLabel()
+        layout.addWidget(self._detail_title)
         
         # Image prompt
         layout.addWidget(QLabel("<b>📷 Prompt Ảnh (Vietnamese):</b>"))
-        ed_img = QTextEdit()
-        ed_img.setReadOnly(True)
-        ed_img.setPlainText(st.get('vi', '(Không có)'))
-        ed_img.setMaximumHeight(160)
-        layout.addWidget(ed_img)
+        self._detail_ed_img = QTextEdit()
+        self._detail_ed_img.setReadOnly(True)
+        self._detail_ed_img.setMaximumHeight(160)
+        layout.addWidget(self._detail_ed_img)
         
         btn_img = QPushButton("📋 Copy Prompt Ảnh")
         btn_img.setFixedHeight(36)
-        btn_img.clicked.connect(lambda: self._copy_to_clipboard(st.get('vi', '')))
+        btn_img.clicked.connect(lambda: self._copy_to_clipboard(self._detail_prompt('vi')))
         layout.addWidget(btn_img)
         
         # Video prompt
         layout.addWidget(QLabel("<b>🎬 Prompt Video (Target):</b>"))
-        ed_vid = QTextEdit()
-        ed_vid.setReadOnly(True)
-        ed_vid.setPlainText(st.get('tgt', '(Không có)'))
-        ed_vid.setMaximumHeight(160)
-        layout.addWidget(ed_vid)
+        self._detail_ed_vid = QTextEdit()
+        self._detail_ed_vid.setReadOnly(True)
+        self._detail_ed_vid.setMaximumHeight(160)
+        layout.addWidget(self._detail_ed_vid)
         
         btn_vid = QPushButton("📋 Copy Prompt Video")
         btn_vid.setFixedHeight(36)
-        btn_vid.clicked.connect(lambda: self._copy_to_clipboard(st.get('tgt', '')))
+        btn_vid.clicked.connect(lambda: self._copy_to_clipboard(self._detail_prompt('tgt')))
         layout.addWidget(btn_vid)
         
         layout.addStretch()
@@ -287,7 +654,7 @@ class StoryboardView(QWidget):
         btn_close.clicked.connect(dialog.close)
         layout.addWidget(btn_close)
         
-        dialog.exec_()
+        self._detail_dialog = dialog
     
     def _copy_to_clipboard(self, text):
         """Copy to clipboard"""
@@ -297,8 +664,19 @@ class StoryboardView(QWidget):
         except Exception as e:
             QMessageBox.warning(self, "Lỗi", f"Không thể copy: {e}")
 '''
-    
-    return storyboard_class, render_method, new_methods
+
+
+def backup_file(filepath):
+    """Create timestamped backup"""
+    backup = f"{filepath}.backup_{time.strftime('%Y%m%d_%H%M%S')}"
+    shutil.copyfile(filepath, backup)  # contents only; the backup needs no metadata
+    print(f"✅ Backup created: {backup}")
+    return backup
+
+
+def create_storyboard_additions():
+    """Create the code additions needed"""
+    return _STORYBOARD_CLASS, _RENDER_METHOD, _NEW_METHODS
 
 
 def patch_file():
@@ -310,218 +688,169 @@ def patch_file():
         print(f"❌ File not found: {filepath}")
         return False
     
+    if os.path.getsize(filepath) == 0:
+        print(f"❌ File is empty: {filepath}")
+        return False
+    
     # Backup
     backup_file(filepath)
     
-    # Read file
-    with open(filepath, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
     print("📝 Patching file...")
     
     # Get additions
     storyboard_class, render_method, new_methods = create_storyboard_additions()
     
-    # Find insertion points
-    new_lines = []
-    i = 0
+    # Single pass over the mapped file. `state` tracks blocks being skipped
+    # for replacement; the flags record which edits have been made. Outside
+    # those blocks the scanner jumps straight to the next edit site and the
+    # bytes in between are copied as-is.
+    out = io.BytesIO()
     
-    # Step 1: Add imports at top (after existing imports)
+    def write(text):
+        out.write(text.encode('utf-8'))
+    
+    state = _COPY
+    widgets_imports = []
     added_imports = False
-    while i < len(lines):
-        new_lines.append(lines[i])
-        
-        # After PyQt5 imports, add missing ones
-        if not added_imports and 'from PyQt5.QtWidgets import' in lines[i]:
-            # Check if QStackedWidget, QDialog, QGridLayout are imported
-            imports_block = []
-            j = i
-            while j < len(lines) and (lines[j].strip().endswith(',') or 'from PyQt5.QtWidgets import' in lines[j]):
-                imports_block.append(lines[j])
-                j += 1
+    seen_collapsible = False
+    added_storyboard = False
+    in_panel = False
+    added_methods = False
+    replaced_scenes_tab = False
+    replaced_render = False
+    patched_job_card = False
+    
+    with open(filepath, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        size = len(data)
+        pos = 0
+        while pos < size:
+            if state == _COPY:
+                match = _SCAN_RE.search(data, pos)
+                if match is None:
+                    out.write(data[pos:])
+                    break
+                start = match.start()
+                out.write(data[pos:start])
+            else:
+                start = pos
+                match = None
+            end = data.find(b'\n', start) + 1 or size
+            line = data[start:end].decode('utf-8')
+            pos = end
+            stripped = line.strip()
+            
+            if state == _IN_WIDGETS_IMPORT:
+                # Collect the parenthesised import list; add missing names before ')'
+                if stripped.startswith(')'):
+                    imports_text = ''.join(widgets_imports)
+                    for line_ in widgets_imports:
+                        write(line_)
+                    for name in _EXTRA_WIDGETS:
+                        if name not in imports_text:
+                            write(f'    {name},\n')
+                    write(line)
+                    widgets_imports = []
+                    state = _COPY
+                else:
+                    widgets_imports.append(line)
+                continue
+            
+            if state == _SKIP_SCENES_TAB:
+                # Drop old scenes tab code up to (not including) the addTab call
+                if 'self.result_tabs.addTab(scenes_widget' in line:
+                    write(_SCENES_TAB_BLOCK)
+                    write(line)  # Keep the addTab line
+                    state = _COPY
+                continue
+            
+            if state == _IN_JOB_CARD:
+                # Refresh the cached counts right after the job's fields are merged
+                if 'v[k] = data.get(k)' in line:
+                    write(line)
+                    write("        st['_video_counts'] = _video_counts(st['videos'])\n")
+                    patched_job_card = True
+                    state = _COPY
+                    continue
+                if not stripped.startswith('def '):
+                    write(line)
+                    continue
+                state = _COPY
+                match = _SCAN_RE.match(data, start)
+            
+            if state == _SKIP_RENDER:
+                # Drop the old method body up to the next method
+                if not (stripped.startswith('def ') and '_render_card_text' not in line):
+                    continue
+                state = _COPY
+                match = _SCAN_RE.match(data, start)
             
-            imports_text = ''.join(imports_block)
+            kind = match.lastgroup if match else None
             
-            # Add missing imports
-            if 'QStackedWidget' not in imports_text:
-                new_lines[-1] = new_lines[-1].rstrip().rstrip(')') + ',\n    QStackedWidget,\n    QDialog,\n    QGridLayout,\n)\n'
-                # Skip the closing paren
-                while i < len(lines) and ')' not in lines[i]:
-                    i += 1
-                i += 1
+            if kind == 'widgets' and not added_imports:
                 added_imports = True
+                if '(' in line and ')' not in line:
+                    write(line)
+                    state = _IN_WIDGETS_IMPORT
+                    continue
+                missing = [name for name in _EXTRA_WIDGETS if name not in line]
+                if missing:
+                    line = line.rstrip() + ''.join(f', {name}' for name in missing) + '\n'
+            
+            elif in_panel and kind in _TOP_LEVEL_KINDS:
+                # First module-level statement after the panel class: end of class
+                write(new_methods + '\n\n')
+                in_panel = False
+                added_methods = True
+            
+            elif kind == 'collapsible' and not seen_collapsible:
+                seen_collapsible = True
+            
+            elif kind in ('cls', 'collapsible') and seen_collapsible and not added_storyboard:
+                # StoryboardView goes right before the class following CollapsibleGroupBox
+                write(storyboard_class + '\n\n')
+                added_storyboard = True
+                in_panel = True
+            
+            elif kind == 'tab3' and in_panel and not replaced_scenes_tab:
+                write(line)
+                replaced_scenes_tab = True
+                state = _SKIP_SCENES_TAB
                 continue
-        
-        i += 1
-    
-    # Now work with new_lines
-    lines = new_lines
-    new_lines = []
-    i = 0
-    
-    # Step 2: Add StoryboardView class after CollapsibleGroupBox
-    added_storyboard = False
-    while i < len(lines):
-        new_lines.append(lines[i])
-        
-        # After CollapsibleGroupBox class definition
-        if not added_storyboard and 'class CollapsibleGroupBox' in lines[i]:
-            # Find end of class (next class or end of file)
-            j = i + 1
-            indent_level = 0
-            while j < len(lines):
-                if lines[j].startswith('class ') and 'CollapsibleGroupBox' not in lines[j]:
-                    # Found next class
-                    new_lines.append(storyboard_class)
-                    added_storyboard = True
-                    break
-                j += 1
             
-            if not added_storyboard:
-                # No next class found, add before Text2VideoPane
-                pass
-        
-        if not added_storyboard and 'class Text2VideoPane' in lines[i]:
-            new_lines.insert(-1, storyboard_class + '\n\n')
-            added_storyboard = True
-        
-        i += 1
+            elif kind == 'render' and in_panel and not replaced_render:
+                write(render_method)
+                replaced_render = True
+                state = _SKIP_RENDER
+                continue
+            
+            elif kind == 'jobcard' and in_panel and not patched_job_card:
+                write(line)
+                state = _IN_JOB_CARD
+                continue
+            
+            write(line)
     
     if not added_storyboard:
         print("❌ Could not find insertion point for StoryboardView")
         return False
     
-    # Step 3: Replace scenes tab section (lines ~499-507)
-    lines = new_lines
-    new_lines = []
-    i = 0
-    replaced_scenes_tab = False
-    
-    while i < len(lines):
-        # Find "# Tab 3: Scene Results"
-        if '# Tab 3: Scene Results' in lines[i] or 'Tab 3: Scene Results' in lines[i]:
-            # Add comment
-            new_lines.append(lines[i])
-            i += 1
-            
-            # Skip old code until self.result_tabs.addTab
-            while i < len(lines) and 'self.result_tabs.addTab(scenes_widget' not in lines[i]:
-                i += 1
-            
-            # Add new code
-            new_lines.append('        scenes_widget = QWidget()\n')
-            new_lines.append('        scenes_layout = QVBoxLayout(scenes_widget)\n')
-            new_lines.append('        scenes_layout.setContentsMargins(4, 4, 4, 4)\n')
-            new_lines.append('\n')
-            new_lines.append('        # Toggle buttons\n')
-            new_lines.append('        toggle_widget = QWidget()\n')
-            new_lines.append('        toggle_layout = QHBoxLayout(toggle_widget)\n')
-            new_lines.append('        toggle_layout.setContentsMargins(8, 8, 8, 8)\n')
-            new_lines.append('        toggle_layout.setSpacing(8)\n')
-            new_lines.append('\n')
-            new_lines.append('        self.btn_view_card = QPushButton("📇 Card")\n')
-            new_lines.append('        self.btn_view_card.setCheckable(True)\n')
-            new_lines.append('        self.btn_view_card.setChecked(True)\n')
-            new_lines.append('        self.btn_view_card.setFixedHeight(34)\n')
-            new_lines.append('        self.btn_view_card.setFixedWidth(100)\n')
-            new_lines.append('        self.btn_view_card.setStyleSheet("""\n')
-            new_lines.append('            QPushButton {\n')
-            new_lines.append('                background: white;\n')
-            new_lines.append('                border: 2px solid #BDBDBD;\n')
-            new_lines.append('                border-radius: 6px;\n')
-            new_lines.append('                font-size: 13px;\n')
-            new_lines.append('                font-weight: 600;\n')
-            new_lines.append('            }\n')
-            new_lines.append('            QPushButton:checked {\n')
-            new_lines.append('                background: #1E88E5;\n')
-            new_lines.append('                border: 2px solid #1E88E5;\n')
-            new_lines.append('                color: white;\n')
-            new_lines.append('            }\n')
-            new_lines.append('            QPushButton:hover { border: 2px solid #1E88E5; }\n')
-            new_lines.append('        """)\n')
-            new_lines.append('        self.btn_view_card.clicked.connect(lambda: self._switch_view("card"))\n')
-            new_lines.append('\n')
-            new_lines.append('        self.btn_view_storyboard = QPushButton("📊 Storyboard")\n')
-            new_lines.append('        self.btn_view_storyboard.setCheckable(True)\n')
-            new_lines.append('        self.btn_view_storyboard.setFixedHeight(34)\n')
-            new_lines.append('        self.btn_view_storyboard.setFixedWidth(120)\n')
-            new_lines.append('        self.btn_view_storyboard.setStyleSheet(self.btn_view_card.styleSheet())\n')
-            new_lines.append('        self.btn_view_storyboard.clicked.connect(lambda: self._switch_view("storyboard"))\n')
-            new_lines.append('\n')
-            new_lines.append('        toggle_layout.addWidget(self.btn_view_card)\n')
-            new_lines.append('        toggle_layout.addWidget(self.btn_view_storyboard)\n')
-            new_lines.append('        toggle_layout.addStretch()\n')
-            new_lines.append('        scenes_layout.addWidget(toggle_widget)\n')
-            new_lines.append('\n')
-            new_lines.append('        # Stacked widget\n')
-            new_lines.append('        from PyQt5.QtWidgets import QStackedWidget\n')
-            new_lines.append('        self.view_stack = QStackedWidget()\n')
-            new_lines.append('\n')
-            new_lines.append('        # Card view\n')
-            new_lines.append('        self.cards = QListWidget()\n')
-            new_lines.append('        self.cards.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)\n')
-            new_lines.append('        self.cards.setIconSize(QSize(240, 135))\n')
-            new_lines.append('        self.cards.itemDoubleClicked.connect(self._open_card_prompt_detail)\n')
-            new_lines.append('        self.view_stack.addWidget(self.cards)\n')
-            new_lines.append('\n')
-            new_lines.append('        # Storyboard view\n')
-            new_lines.append('        self.storyboard_view = StoryboardView(self)\n')
-            new_lines.append('        self.storyboard_view.scene_clicked.connect(self._show_prompt_detail)\n')
-            new_lines.append('        self.view_stack.addWidget(self.storyboard_view)\n')
-            new_lines.append('\n')
-            new_lines.append('        scenes_layout.addWidget(self.view_stack)\n')
-            new_lines.append(lines[i])  # Add the addTab line
-            replaced_scenes_tab = True
-            i += 1
-            continue
-        
-        new_lines.append(lines[i])
-        i += 1
-    
     if not replaced_scenes_tab:
         print("⚠️  Could not find scenes tab section, adding anyway")
     
-    # Step 4: Replace _render_card_text method
-    lines = new_lines
-    new_lines = []
-    i = 0
-    replaced_render = False
-    
-    while i < len(lines):
-        if 'def _render_card_text(self' in lines[i]:
-            # Skip old method
-            new_lines.append(render_method)
-            while i < len(lines) and not (lines[i].strip().startswith('def ') and '_render_card_text' not in lines[i]):
-                i += 1
-            replaced_render = True
-            continue
-        
-        new_lines.append(lines[i])
-        i += 1
-    
     if not replaced_render:
         print("⚠️  Could not replace _render_card_text")
     
-    # Step 5: Add new methods at end of class
-    lines = new_lines
-    new_lines = []
-    
-    # Find last line of Text2VideoPane class
-    last_method_line = 0
-    for i, line in enumerate(lines):
-        if line.strip() and not line[0].isspace():
-            # Non-indented line (new class or module-level)
-            if i > 100:  # Skip early module stuff
-                # Add methods before this line
-                new_lines = lines[:i] + [new_methods + '\n\n'] + lines[i:]
-                break
-    else:
-        # No other class found, add at end
-        new_lines = lines + [new_methods]
+    if not patched_job_card:
+        print("⚠️  Could not hook video counts into _on_job_card")
+    
+    if not added_methods:
+        # Panel class runs to the end of the file
+        write(new_methods)
     
     # Write file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.writelines(new_lines)
+    with open(filepath, 'wb') as f:
+        f.write(out.getvalue())
     
     print(f"✅ File patched successfully: {filepath}")
     print(f"   Added {len(storyboard_class.split(chr(10)))} lines for StoryboardView")
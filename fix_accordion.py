@@ -6,24 +6,52 @@ Fix UI Issues:
 3. Fix missing text in tabs
 """
 
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from string import Template
 
-def create_ripple_button(repo_root):
-    """Create RippleButton widget with Material Design ripple effect"""
-    widget_path = repo_root / "ui" / "widgets" / "ripple_button.py"
-    widget_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    ripple_code = '''# -*- coding: utf-8 -*-
+_REPO_ROOT = Path(__file__).resolve().parent
+
+# ui/widgets/ripple_button.py
+_RIPPLE_CODE = '''# -*- coding: utf-8 -*-
 """
 Material Design Ripple Button
 Implements ripple effect animation on click
 """
 
+import time
+
 from PyQt5.QtWidgets import QPushButton
-from PyQt5.QtCore import QPropertyAnimation, QEasingCurve, QRect, QTimer, pyqtProperty
-from PyQt5.QtGui import QPainter, QColor, QPainterPath
+from PyQt5.QtCore import QRect, QRectF, QTimer
+from PyQt5.QtGui import QPainter, QColor, QPainterPath, QPixmap
 from PyQt5.QtCore import Qt, QPoint
 
+RIPPLE_DURATION = 0.6  # seconds
+RIPPLE_TEXTURE_SIZE = 256  # px; scaled to the ripple each frame
+EASE_STEPS = 1024  # under a pixel of error even on wide buttons
+
+# OutCubic sampled once at import; _tick does a table lookup instead of the pow
+_EASE_OUT_CUBIC = tuple(1.0 - (1.0 - i / EASE_STEPS) ** 3 for i in range(EASE_STEPS + 1))
+
+_ripple_textures = {}  # QColor.rgba() -> QPixmap
+
+def _ripple_texture(color):
+    """Pre-rendered antialiased disc in color, shared by all buttons using it"""
+    pix = _ripple_textures.get(color.rgba())
+    if pix is None:
+        pix = QPixmap(RIPPLE_TEXTURE_SIZE, RIPPLE_TEXTURE_SIZE)
+        pix.fill(Qt.transparent)
+        painter = QPainter(pix)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setBrush(color)
+        painter.setPen(Qt.NoPen)
+        painter.drawEllipse(0, 0, RIPPLE_TEXTURE_SIZE, RIPPLE_TEXTURE_SIZE)
+        painter.end()
+        _ripple_textures[color.rgba()] = pix
+    return pix
+
 class RippleButton(QPushButton):
     """QPushButton with Material Design ripple effect"""
     
@@ -31,9 +59,17 @@ class RippleButton(QPushButton):
         super().__init__(*args, **kwargs)
         self._ripple_radius = 0
         self._ripple_pos = QPoint()
-        self._ripple_animation = None
+        self._max_radius = 0
+        self._ripple_t0 = 0.0
         self._ripple_color = QColor(255, 255, 255, 80)
+        self._clip_path = QPainterPath()
+        self._ripple_pix = None
         
+        # Plain frame timer; the radius is a Python float, not a Qt property
+        self._ripple_timer = QTimer(self)
+        self._ripple_timer.setInterval(16)  # one 60 fps frame
+        self._ripple_timer.timeout.connect(self._tick)
+    
     def mousePressEvent(self, event):
         """Start ripple animation on mouse press"""
         self._ripple_pos = event.pos()
@@ -42,158 +78,68 @@ class RippleButton(QPushButton):
     
     def _start_ripple(self):
         """Start the ripple animation"""
+        # A new press restarts the ripple; wipe the old one wherever it was
+        if self._ripple_radius > 0:
+            self._ripple_radius = 0
+            self.update()
+        
         # Calculate max radius (corner to corner)
-        max_radius = max(self.width(), self.height()) * 1.5
+        self._max_radius = max(self.width(), self.height()) * 1.5
+        
+        # Clip to button shape; built once per ripple instead of every frame
+        self._clip_path = QPainterPath()
+        self._clip_path.addRoundedRect(QRectF(self.rect()), 20, 20)  # Match button border-radius
+        
+        # Frames blit this instead of rasterising an ellipse each time
+        self._ripple_pix = _ripple_texture(self._ripple_color)
         
-        # Create animation
-        self._ripple_animation = QPropertyAnimation(self, b"ripple_radius")
-        self._ripple_animation.setDuration(600)  # 600ms duration
-        self._ripple_animation.setStartValue(0)
-        self._ripple_animation.setEndValue(max_radius)
-        self._ripple_animation.setEasingCurve(QEasingCurve.OutCubic)
-        self._ripple_animation.finished.connect(self._reset_ripple)
-        self._ripple_animation.start()
+        self._ripple_t0 = time.perf_counter()
+        self._ripple_timer.start()
+    
+    def _tick(self):
+        """Advance the ripple by one frame"""
+        t = min(1.0, (time.perf_counter() - self._ripple_t0) / RIPPLE_DURATION)
+        self._ripple_radius = _EASE_OUT_CUBIC[int(t * EASE_STEPS)] * self._max_radius
+        
+        # The ripple only grows, so repainting its bounding box covers the last frame too.
+        # Always update(), never repaint(): Qt merges pending updates into one
+        # paintEvent per event-loop pass, so slow frames can't queue up
+        self.update(self._ripple_rect().intersected(self.rect()))
+        
+        if t >= 1.0:
+            self._ripple_timer.stop()
+            self._reset_ripple()
+    
+    def _ripple_rect(self):
+        """Bounding box of the current ripple circle"""
+        r = int(self._ripple_radius) + 1
+        return QRect(self._ripple_pos.x() - r, self._ripple_pos.y() - r, 2 * r, 2 * r)
     
     def _reset_ripple(self):
         """Reset ripple after animation completes"""
         self._ripple_radius = 0
         self.update()
     
-    @pyqtProperty(float)
-    def ripple_radius(self):
-        return self._ripple_radius
-    
-    @ripple_radius.setter
-    def ripple_radius(self, value):
-        self._ripple_radius = value
-        self.update()  # Trigger repaint
-    
     def paintEvent(self, event):
         """Custom paint to draw ripple effect"""
         super().paintEvent(event)
         
-        if self._ripple_radius > 0:
+        if self._ripple_radius > 0 and event.region().intersects(self._ripple_rect()):
             painter = QPainter(self)
-            painter.setRenderHint(QPainter.Antialiasing)
-            
-            # Clip to button shape
-            path = QPainterPath()
-            path.addRoundedRect(self.rect(), 20, 20)  # Match button border-radius
-            painter.setClipPath(path)
+            # Hints are set only when there is a ripple to draw. Not
+            # HighQualityAntialiasing: it is deprecated and ignored by the raster engine
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform, True)
+            # Intersect with any clip already on the painter rather than replacing it
+            painter.setClipPath(self._clip_path, Qt.IntersectClip)
             
             # Draw ripple
-            painter.setBrush(self._ripple_color)
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(self._ripple_pos, self._ripple_radius, self._ripple_radius)
+            r = self._ripple_radius
+            target = QRectF(self._ripple_pos.x() - r, self._ripple_pos.y() - r, 2 * r, 2 * r)
+            painter.drawPixmap(target, self._ripple_pix, QRectF(self._ripple_pix.rect()))
 '''
-    
-    with open(widget_path, 'w', encoding='utf-8') as f:
-        f.write(ripple_code)
-    
-    print(f"✅ Created: {widget_path}")
 
-def fix_button_sizes(repo_root):
-    """Fix button sizes - make them more compact"""
-    theme_file = repo_root / "ui" / "styles" / "light_theme.py"
-    
-    with open(theme_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Reduce button padding and height
-    old_button_style = '''QPushButton {
-    background: #1E88E5;
-    color: white;
-    border: none;
-    border-radius: 6px;
-    padding: 8px 16px;
-    min-height: 32px;
-    font-weight: 600;
-    font-size: 14px;
-    font-family: "Segoe UI", Arial, sans-serif;
-}'''
-    
-    new_button_style = '''QPushButton {
-    background: #1E88E5;
-    color: white;
-    border: none;
-    border-radius: 4px;
-    padding: 6px 12px;
-    min-height: 28px;
-    max-height: 32px;
-    font-weight: 500;
-    font-size: 13px;
-    font-family: "Segoe UI", Arial, sans-serif;
-}'''
-    
-    content = content.replace(old_button_style, new_button_style)
-    
-    with open(theme_file, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"✅ Fixed button sizes in: {theme_file}")
-
-def fix_tab_text(repo_root):
-    """Fix missing text in tabs - reduce padding, fix font size"""
-    theme_file = repo_root / "ui" / "styles" / "light_theme.py"
-    
-    with open(theme_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Fix main tabs (top level)
-    old_tab_style = '''QTabBar::tab {
-    font-family: "Segoe UI", Arial, sans-serif;
-    font-weight: 700;
-    font-size: 15px;
-    min-width: 150px;
-    padding: 12px 24px;
-    margin-right: 2px;
-    border-top-left-radius: 8px;
-    border-top-right-radius: 8px;
-    color: #FFFFFF;
-    background: #BDBDBD;
-}'''
-    
-    new_tab_style = '''QTabBar::tab {
-    font-family: "Segoe UI", Arial, sans-serif;
-    font-weight: 600;
-    font-size: 13px;
-    min-width: 120px;
-    padding: 8px 16px;
-    margin-right: 2px;
-    border-top-left-radius: 6px;
-    border-top-right-radius: 6px;
-    color: #FFFFFF;
-    background: #BDBDBD;
-}'''
-    
-    content = content.replace(old_tab_style, new_tab_style)
-    
-    # Fix tab selected state
-    old_selected = '''QTabBar::tab:selected {
-    border-bottom: 4px solid #212121;
-    font-size: 15px;
-    padding-bottom: 8px;
-}'''
-    
-    new_selected = '''QTabBar::tab:selected {
-    border-bottom: 3px solid #212121;
-    font-size: 13px;
-    padding-bottom: 5px;
-    font-weight: 700;
-}'''
-    
-    content = content.replace(old_selected, new_selected)
-    
-    with open(theme_file, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"✅ Fixed tab text visibility in: {theme_file}")
-
-def add_ripple_to_buttons(repo_root):
-    """Create helper function to convert QPushButton to RippleButton"""
-    utils_file = repo_root / "ui" / "widgets" / "button_utils.py"
-    
-    utils_code = '''# -*- coding: utf-8 -*-
+# ui/widgets/button_utils.py
+_BUTTON_UTILS_CODE = '''# -*- coding: utf-8 -*-
 """
 Button utilities for easy RippleButton usage
 """
@@ -225,49 +171,44 @@ def create_ripple_button(text, object_name=None, parent=None):
 # btn_save = create_ripple_button("💾 Lưu", "btn_save")
 # btn_delete = create_ripple_button("🗑️ Xóa", "btn_danger")
 '''
-    
-    with open(utils_file, 'w', encoding='utf-8') as f:
-        f.write(utils_code)
-    
-    print(f"✅ Created: {utils_file}")
 
-def create_demo_file(repo_root):
-    """Create demo file to test RippleButton"""
-    demo_file = repo_root / "test_ripple_button.py"
-    
-    demo_code = '''#!/usr/bin/env python3
+# test_ripple_button.py
+_DEMO_CODE = '''#!/usr/bin/env python3
 """
 Demo: Test RippleButton with Material Design ripple effect
 """
 
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout
-from ui.widgets.ripple_button import RippleButton
 
-class Demo(QWidget):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("RippleButton Demo")
-        self.resize(400, 300)
-        
-        layout = QVBoxLayout(self)
-        
-        # Create ripple buttons
-        btn1 = RippleButton("Click me for ripple!")
-        btn1.setObjectName("btn_primary")
-        
-        btn2 = RippleButton("💾 Save Button")
-        btn2.setObjectName("btn_save")
-        
-        btn3 = RippleButton("🗑️ Delete Button")
-        btn3.setObjectName("btn_danger")
-        
-        layout.addWidget(btn1)
-        layout.addWidget(btn2)
-        layout.addWidget(btn3)
-        layout.addStretch()
-
-if __name__ == "__main__":
+def _run():
+    # PyQt5 is only imported when the demo actually runs, so importing this
+    # module (e.g. from a test collector) stays cheap
+    from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout
+    from ui.widgets.ripple_button import RippleButton
+    
+    class Demo(QWidget):
+        def __init__(self):
+            super().__init__()
+            self.setWindowTitle("RippleButton Demo")
+            self.resize(400, 300)
+            
+            layout = QVBoxLayout(self)
+            
+            # Create ripple buttons
+            btn1 = RippleButton("Click me for ripple!")
+            btn1.setObjectName("btn_primary")
+            
+            btn2 = RippleButton("💾 Save Button")
+            btn2.setObjectName("btn_save")
+            
+            btn3 = RippleButton("🗑️ Delete Button")
+            btn3.setObjectName("btn_danger")
+            
+            layout.addWidget(btn1)
+            layout.addWidget(btn2)
+            layout.addWidget(btn3)
+            layout.addStretch()
+    
     app = QApplication(sys.argv)
     
     # Apply theme
@@ -280,57 +221,172 @@ if __name__ == "__main__":
     demo = Demo()
     demo.show()
     sys.exit(app.exec_())
+
+if __name__ == "__main__":
+    _run()
 '''
-    
-    with open(demo_file, 'w', encoding='utf-8') as f:
-        f.write(demo_code)
-    
-    print(f"✅ Created demo: {demo_file}")
 
-def main():
-    print("=" * 70)
-    print("🎨 FIX UI ISSUES")
-    print("=" * 70)
-    print()
-    
-    repo_root = Path(__file__).parent.resolve()
+# light_theme.py fixes as (old, new) pairs, applied in order by fix_theme().
+# Each old/new pair differs only in a few values, so both come from one template.
+
+# Buttons: reduce padding and height
+_BUTTON_TMPL = Template('''QPushButton {
+    background: #1E88E5;
+    color: white;
+    border: none;
+    border-radius: ${radius}px;
+    padding: ${pad_v}px ${pad_h}px;
+    min-height: ${min_h}px;
+${extra}    font-weight: ${weight};
+    font-size: ${size}px;
+    font-family: "Segoe UI", Arial, sans-serif;
+}''')
+_OLD_BUTTON = _BUTTON_TMPL.substitute(radius=6, pad_v=8, pad_h=16, min_h=32, extra='',
+                                      weight=600, size=14)
+_NEW_BUTTON = _BUTTON_TMPL.substitute(radius=4, pad_v=6, pad_h=12, min_h=28,
+                                      extra='    max-height: 32px;\n', weight=500, size=13)
+
+# Main tabs (top level): reduce padding, fix font size
+_TAB_TMPL = Template('''QTabBar::tab {
+    font-family: "Segoe UI", Arial, sans-serif;
+    font-weight: ${weight};
+    font-size: ${size}px;
+    min-width: ${min_w}px;
+    padding: ${pad_v}px ${pad_h}px;
+    margin-right: 2px;
+    border-top-left-radius: ${radius}px;
+    border-top-right-radius: ${radius}px;
+    color: #FFFFFF;
+    background: #BDBDBD;
+}''')
+_OLD_TAB = _TAB_TMPL.substitute(weight=700, size=15, min_w=150, pad_v=12, pad_h=24, radius=8)
+_NEW_TAB = _TAB_TMPL.substitute(weight=600, size=13, min_w=120, pad_v=8, pad_h=16, radius=6)
+
+# Tab selected state
+_SELECTED_TMPL = Template('''QTabBar::tab:selected {
+    border-bottom: ${border}px solid #212121;
+    font-size: ${size}px;
+    padding-bottom: ${pad}px;
+${extra}}''')
+_OLD_SELECTED = _SELECTED_TMPL.substitute(border=4, size=15, pad=8, extra='')
+_NEW_SELECTED = _SELECTED_TMPL.substitute(border=3, size=13, pad=5,
+                                          extra='    font-weight: 700;\n')
+
+_THEME_FIXES = (
+    (_OLD_BUTTON, _NEW_BUTTON),
+    (_OLD_TAB, _NEW_TAB),
+    (_OLD_SELECTED, _NEW_SELECTED),
+)
+
+# Generated files, encoded once; written out byte for byte
+_RIPPLE_BYTES = _RIPPLE_CODE.encode('utf-8')
+_BUTTON_UTILS_BYTES = _BUTTON_UTILS_CODE.encode('utf-8')
+_DEMO_BYTES = _DEMO_CODE.encode('utf-8')
+
+def write_if_changed(path, data):
+    """Write data (bytes) to path unless it already holds it; return True if written"""
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.write_bytes(data)
+    return True
+
+def create_ripple_button(repo_root):
+    """Create RippleButton widget with Material Design ripple effect"""
+    widget_path = repo_root / "ui" / "widgets" / "ripple_button.py"
+    widget_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Fix 1: Create RippleButton
-    print("1️⃣ Creating RippleButton widget...")
-    create_ripple_button(repo_root)
-    add_ripple_to_buttons(repo_root)
-    print()
+    if write_if_changed(widget_path, _RIPPLE_BYTES):
+        return f"✅ Created: {widget_path}"
+    return f"✓ Up to date: {widget_path}"
+
+def fix_theme(repo_root):
+    """Fix button sizes and tab text in the light theme in one read/write"""
+    theme_file = repo_root / "ui" / "styles" / "light_theme.py"
     
-    # Fix 2: Reduce button sizes
-    print("2️⃣ Fixing button sizes (more compact)...")
-    fix_button_sizes(repo_root)
-    print()
+    orig = theme_file.read_text(encoding='utf-8')
+    content = orig
+    for old, new in _THEME_FIXES:
+        content = content.replace(old, new)
+    if content == orig:
+        return f"✓ Already fixed: {theme_file}"
+    theme_file.write_text(content, encoding='utf-8')
     
-    # Fix 3: Fix tab text visibility
-    print("3️⃣ Fixing tab text (reduce padding, adjust font)...")
-    fix_tab_text(repo_root)
-    print()
+    return (f"✅ Fixed button sizes in: {theme_file}\n"
+            f"✅ Fixed tab text visibility in: {theme_file}")
+
+def add_ripple_to_buttons(repo_root):
+    """Create helper function to convert QPushButton to RippleButton"""
+    utils_file = repo_root / "ui" / "widgets" / "button_utils.py"
+    utils_file.parent.mkdir(parents=True, exist_ok=True)
     
-    # Create demo
-    print("📝 Creating demo file...")
-    create_demo_file(repo_root)
-    print()
+    if write_if_changed(utils_file, _BUTTON_UTILS_BYTES):
+        return f"✅ Created: {utils_file}"
+    return f"✓ Up to date: {utils_file}"
+
+def create_demo_file(repo_root):
+    """Create demo file to test RippleButton"""
+    demo_file = repo_root / "test_ripple_button.py"
     
-    print("=" * 70)
-    print("✅ ALL FIXES COMPLETE!")
-    print()
-    print("📌 CHANGES:")
-    print("  • RippleButton widget with Material ripple animation")
-    print("  • Buttons: 28-32px height (was 32px+), less padding")
-    print("  • Tabs: 13px font (was 15px), less padding")
-    print("  • Fixed tab text visibility")
-    print()
-    print("🧪 TEST:")
-    print("  python test_ripple_button.py  # Test ripple effect")
-    print()
-    print("🚀 RUN:")
-    print("  python main_image2video.py")
-    print("=" * 70)
+    if write_if_changed(demo_file, _DEMO_BYTES):
+        return f"✅ Created demo: {demo_file}"
+    return f"✓ Up to date: {demo_file}"
+
+def main():
+    # Progress is collected here and written in one go at the end, so the
+    # console sees a single write instead of one flush per line
+    out = io.StringIO()
+    try:
+        print("=" * 70, file=out)
+        print("🎨 FIX UI ISSUES", file=out)
+        print("=" * 70, file=out)
+        print(file=out)
+        
+        repo_root = _REPO_ROOT
+        
+        # Each task owns a different file, so they run concurrently; results
+        # are reported in order below
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            ripple = pool.submit(create_ripple_button, repo_root)
+            utils = pool.submit(add_ripple_to_buttons, repo_root)
+            theme = pool.submit(fix_theme, repo_root)
+            demo = pool.submit(create_demo_file, repo_root)
+        
+        # Fix 1: Create RippleButton
+        print("1️⃣ Creating RippleButton widget...", file=out)
+        print(ripple.result(), file=out)
+        print(utils.result(), file=out)
+        print(file=out)
+        
+        # Fix 2 + 3: Reduce button sizes, fix tab text visibility
+        # (both edit light_theme.py, so they share one read and one write)
+        print("2️⃣ Fixing button sizes (more compact)...", file=out)
+        print("3️⃣ Fixing tab text (reduce padding, adjust font)...", file=out)
+        print(theme.result(), file=out)
+        print(file=out)
+        
+        # Create demo
+        print("📝 Creating demo file...", file=out)
+        print(demo.result(), file=out)
+        print(file=out)
+        
+        print("=" * 70, file=out)
+        print("✅ ALL FIXES COMPLETE!", file=out)
+        print(file=out)
+        print("📌 CHANGES:", file=out)
+        print("  • RippleButton widget with Material ripple animation", file=out)
+        print("  • Buttons: 28-32px height (was 32px+), less padding", file=out)
+        print("  • Tabs: 13px font (was 15px), less padding", file=out)
+        print("  • Fixed tab text visibility", file=out)
+        print(file=out)
+        print("🧪 TEST:", file=out)
+        print("  python test_ripple_button.py  # Test ripple effect", file=out)
+        print(file=out)
+        print("🚀 RUN:", file=out)
+        print("  python main_image2video.py", file=out)
+        print("=" * 70, file=out)
+    finally:
+        sys.stdout.write(out.getvalue())
+        sys.stdout.flush()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Data-driven GUI migration
+Applies a migration spec from migrations/<version>.json
+
+Usage: python migrate.py --version v3
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import time
+from pathlib import Path
+
+_REPO_ROOT = Path(__file__).resolve().parent
+
+def load_spec(repo_root, version):
+    """Load migrations/<version>.json"""
+    spec_file = repo_root / "migrations" / f"{version}.json"
+    return json.loads(spec_file.read_text(encoding='utf-8'))
+
+def check_files_exist(repo_root, required_files):
+    """Return the required files that are missing"""
+    return [f for f in required_files if not (repo_root / f).exists()]
+
+def backup_file(filepath, data, name_tmpl):
+    """Save data (the file's current bytes) under the spec's backup name"""
+    backup = filepath.with_name(name_tmpl.format(
+        name=filepath.name, stem=filepath.stem, time=int(time.time())))
+    backup.write_bytes(data)
+    print(f"✓ Backup: {backup.name}")
+    return backup
+
+def replace_all(data, replacements):
+    """Apply the {old: new} str mapping to data (any bytes-like buffer) in one scan
+
+    Returns the new bytes and the old strings that matched, in file order.
+    """
+    # Match on the encoded bytes so the buffer never has to be decoded;
+    # longest first so no key shadows a longer one
+    mapping = {old.encode('utf-8'): new.encode('utf-8') for old, new in replacements.items()}
+    pattern = re.compile(b'|'.join(map(re.escape, sorted(mapping, key=len, reverse=True))))
+    hits = {}
+
+    def _sub(match):
+        old = match.group(0)
+        hits[old] = hits.get(old, 0) + 1
+        return mapping[old]
+
+    content = pattern.sub(_sub, data)
+    return content, [old.decode('utf-8') for old in hits]
+
+def write_atomic(path, data):
+    """Replace path with data via a sibling temp file"""
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def apply_migrations(spec, repo_root):
+    """Back up the spec's target and apply its replacements; False if the target is missing"""
+    target = repo_root / spec["target"]
+
+    if not target.exists():
+        print(f"❌ Not found: {target}")
+        return False
+    if target.stat().st_size == 0:
+        print(f"❌ Empty file: {target}")
+        return False
+
+    # Scan the file through a read-only mapping. The map is closed before
+    # the target is replaced.
+    with open(target, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        content, replaced = replace_all(data, spec["replacements"])
+        # Back up from the same pages, and only when the target will change
+        if replaced:
+            backup_file(target, data, spec["backup"])
+
+    for old in replaced:
+        print(f"✓ Replaced: {old[:50]}...")
+
+    if replaced:
+        write_atomic(target, content)
+        print(f"✅ Updated: {target.name}")
+    else:
+        print(f"✓ Already up to date: {target.name}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a GUI migration spec")
+    parser.add_argument("--version", required=True, help="spec name in migrations/, e.g. v3")
+    args = parser.parse_args()
+
+    repo_root = _REPO_ROOT
+    spec = load_spec(repo_root, args.version)
+
+    missing = check_files_exist(repo_root, spec.get("required", []))
+    if missing:
+        print("❌ Missing files:")
+        for f in missing:
+            print(f"   • {f}")
+        return 1
+
+    return 0 if apply_migrations(spec, repo_root) else 1
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
-import requests, time, random
-from typing import List, Optional
+import atexit, json, requests, time, random
+from requests.adapters import HTTPAdapter
+from typing import Callable, List, Optional
 from services.core.config import load as load_config
 from services.core.key_manager import get_all_keys, refresh
-from services.core.api_config import GEMINI_TEXT_MODEL, gemini_text_endpoint
+from services.core.api_config import GEMINI_BASE, GEMINI_TEXT_MODEL, gemini_text_endpoint
+
+# One pooled session for every key (the key travels in the URL), so repeated
+# calls reuse the TLS connection to Google; retries stay in generate()
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+atexit.register(_SESSION.close)
 
 class MissingAPIKey(Exception): pass
+class GenerationCancelled(Exception): pass
 class GeminiClient:
     def __init__(self, model: str = None, api_key: Optional[str] = None):
         refresh()
@@ -19,19 +27,51 @@ class GeminiClient:
         if self.model == GEMINI_TEXT_MODEL:
             return gemini_text_endpoint(key)
         return f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent?key={key}"
-    def generate(self, system_text: str, user_text: str, timeout: int = 180)->str:
+    def _stream_endpoint(self, key):
+        return f"{GEMINI_BASE}/models/{self.model}:streamGenerateContent?alt=sse&key={key}"
+    def _generate_stream(self, key, body, timeout, on_progress: Optional[Callable[[int], None]],
+                         should_continue: Optional[Callable[[], bool]] = None)->str:
+        """Read the reply as server-sent events, reporting the text length received so far"""
+        with _SESSION.post(self._stream_endpoint(key), json=body, timeout=timeout, stream=True) as r:
+            if r.status_code in (429,408) or r.status_code>=500: raise requests.HTTPError(str(r.status_code), response=r)
+            r.raise_for_status()
+            r.encoding="utf-8"
+            parts=[]; received=0
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"): continue
+                try: chunk=json.loads(line[5:])
+                except ValueError: raise ValueError("Failed to parse JSON stream chunk from Gemini")
+                for cand in chunk.get("candidates", [])[:1]:
+                    for part in cand.get("content", {}).get("parts", []):
+                        text=part.get("text")
+                        if text: parts.append(text); received+=len(text)
+                if on_progress is not None: on_progress(received)
+                if should_continue is not None and not should_continue():
+                    raise GenerationCancelled("Gemini stream cancelled")
+            return "".join(parts)
+    def generate(self, system_text: str, user_text: str, timeout: int = 180,
+                 on_progress: Optional[Callable[[int], None]] = None,
+                 should_continue: Optional[Callable[[], bool]] = None)->str:
+        """Generate text; with on_progress the reply is streamed and on_progress(chars) called per chunk.
+        With should_continue it is streamed too, and abandoned (GenerationCancelled) once
+        should_continue() returns False."""
         last=None
         for i in range(5):
             key=self._next_key()
             try:
                 body={"system_instruction":{"parts":[{"text":system_text}]},
                       "contents":[{"role":"user","parts":[{"text":user_text}]}]}
-                r=requests.post(self._endpoint(key), json=body, timeout=timeout)
+                if on_progress is not None or should_continue is not None:
+                    return self._generate_stream(key, body, timeout, on_progress, should_continue)
+                r=_SESSION.post(self._endpoint(key), json=body, timeout=timeout)
                 if r.status_code in (429,408) or r.status_code>=500: raise requests.HTTPError(str(r.status_code), response=r)
                 r.raise_for_status()
                 data=r.json()
                 return data["candidates"][0]["content"]["parts"][0]["text"]
             except requests.RequestException as e:
-                last=e; time.sleep(1.5*(i+1)); continue
+                last=e
+                if should_continue is not None and not should_continue():
+                    raise GenerationCancelled("Gemini request cancelled") from e
+                time.sleep(1.5*(i+1)); continue
         if last: raise last
         raise RuntimeError("Gemini không phản hồi")
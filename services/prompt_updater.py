@@ -5,14 +5,34 @@ Fetches and updates domain prompts from Google Sheets
 """
 import csv
 import io
+import json
+import os
 import re
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Tuple
+from urllib3.util.retry import Retry
 
 
 # Default Google Sheets URL (can be overridden)
 DEFAULT_SHEETS_URL = "https://docs.google.com/spreadsheets/d/1ohiL6xOBbjC7La2iUdkjrVjG4IEUnVWhI0fRoarD6P0/edit?gid=1507296519"
 
+_SHEET_RE = re.compile(r'/spreadsheets/d/([a-zA-Z0-9-_]+)')
+_GID_RE = re.compile(r'[?&#]gid=(\d+)')
+
+# Parsed prompts of recent fetches: (sheet_id, gid) -> (etag, last_modified, prompts)
+_PROMPTS_CACHE = {}
+_PROMPTS_CACHE_SIZE = 8
+
+# Shared session: keeps the TLS connection to docs.google.com alive between
+# fetches and retries transient errors with backoff
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
 
 def extract_sheet_info(sheet_url: str) -> Tuple[str, str, str]:
     """
@@ -26,14 +46,14 @@ def extract_sheet_info(sheet_url: str) -> Tuple[str, str, str]:
     """
     try:
         # Extract sheet ID
-        sheet_match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        sheet_match = _SHEET_RE.search(sheet_url)
         if not sheet_match:
             return "", "", "URL không hợp lệ: Không tìm thấy spreadsheet ID"
         
         sheet_id = sheet_match.group(1)
         
         # Extract gid (optional, default to 0)
-        gid_match = re.search(r'[?&#]gid=(\d+)', sheet_url)
+        gid_match = _GID_RE.search(sheet_url)
         gid = gid_match.group(1) if gid_match else "0"
         
         return sheet_id, gid, ""
@@ -42,6 +62,89 @@ def extract_sheet_info(sheet_url: str) -> Tuple[str, str, str]:
         return "", "", f"Lỗi khi parse URL: {str(e)}"
 
 
+def _fetch_sheet(sheet_id: str, gid: str, etag: str = "", last_modified: str = "") -> Tuple[Dict[str, Dict[str, str]], str, str, str]:
+    """
+    Download and parse one sheet's CSV export, conditionally if validators are given
+    
+    Args:
+        sheet_id: Spreadsheet ID
+        gid: Sheet (tab) ID
+        etag: ETag of a copy the caller already has (optional)
+        last_modified: Last-Modified of that copy (optional)
+    
+    Returns:
+        Tuple of (prompts_dict, error_message, etag, last_modified);
+        prompts_dict is None when the sheet answered 304 Not Modified
+    """
+    # Build CSV export URL
+    csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
+    
+    headers = {"Accept-Encoding": "gzip"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    
+    try:
+        # Fetch CSV from Google Sheets; the body is parsed as it arrives
+        # instead of being downloaded and decoded in full first
+        with _SESSION.get(csv_url, timeout=(5, 30), headers=headers, stream=True) as response:
+            response.raise_for_status()
+            
+            etag = response.headers.get("ETag", "")
+            last_modified = response.headers.get("Last-Modified", "")
+            if response.status_code == 304:
+                return None, "", etag, last_modified
+            
+            # Parse CSV. Not iter_lines(): it strips line breaks, which would
+            # join the lines of multi-line prompts inside quoted fields
+            response.raw.decode_content = True
+            csv_reader = csv.DictReader(io.TextIOWrapper(response.raw, encoding='utf-8', newline=''))
+            
+            # Build nested dictionary
+            prompts = {}
+            row_count = 0
+            
+            for row in csv_reader:
+                domain = row.get('Domain', '').strip()
+                topic = row.get('Topic', '').strip()
+                system_prompt = row.get('System Prompt', '').strip()
+                
+                # Skip empty rows
+                if not domain or not topic or not system_prompt:
+                    continue
+                
+                # Add to nested dict
+                if domain not in prompts:
+                    prompts[domain] = {}
+                
+                prompts[domain][topic] = system_prompt
+                row_count += 1
+        
+        if row_count == 0:
+            return {}, "Không tìm thấy dữ liệu hợp lệ trong CSV", "", ""
+        
+        return prompts, "", etag, last_modified
+        
+    except requests.exceptions.Timeout:
+        return {}, "Timeout - vui lòng kiểm tra kết nối internet", "", ""
+    
+    except requests.exceptions.RequestException as e:
+        return {}, f"Lỗi mạng: {str(e)}", "", ""
+    
+    except Exception as e:
+        return {}, f"Lỗi không xác định: {str(e)}", "", ""
+
+
+def _remember_prompts(key: Tuple[str, str], etag: str, last_modified: str, prompts: Dict[str, Dict[str, str]]):
+    """Keep parsed prompts for a later conditional fetch; no-op without validators"""
+    if not etag and not last_modified:
+        return
+    if key not in _PROMPTS_CACHE and len(_PROMPTS_CACHE) >= _PROMPTS_CACHE_SIZE:
+        _PROMPTS_CACHE.pop(next(iter(_PROMPTS_CACHE)))  # oldest entry
+    _PROMPTS_CACHE[key] = (etag, last_modified, prompts)
+
+
 def fetch_prompts_from_sheets(sheet_url: str = None) -> Tuple[Dict[str, Dict[str, str]], str]:
     """
     Fetch system prompts from Google Sheets CSV export
@@ -61,51 +164,146 @@ def fetch_prompts_from_sheets(sheet_url: str = None) -> Tuple[Dict[str, Dict[str
     if error:
         return {}, error
     
-    # Build CSV export URL
-    csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
+    # Revalidate a previous fetch of the same sheet instead of re-downloading it
+    key = (sheet_id, gid)
+    cached = _PROMPTS_CACHE.get(key)
+    if cached:
+        prompts, error, etag, last_modified = _fetch_sheet(sheet_id, gid, cached[0], cached[1])
+    else:
+        prompts, error, etag, last_modified = _fetch_sheet(sheet_id, gid)
+    
+    if error:
+        return {}, error
+    if prompts is None:
+        return cached[2], ""
     
+    _remember_prompts(key, etag, last_modified, prompts)
+    return prompts, ""
+
+
+def _cache_file(file_path: str) -> str:
+    """Sidecar JSON recording which sheet version file_path was generated from"""
+    return file_path + '.cache.json'
+
+
+def _read_cache_file(file_path: str, sheet_id: str, gid: str) -> Dict[str, str]:
+    """Validators for file_path's sheet, or {} if the file changed since they were saved"""
     try:
-        # Fetch CSV from Google Sheets
-        response = requests.get(csv_url, timeout=30)
-        response.raise_for_status()
-        
-        # Parse CSV
-        csv_content = response.content.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        with open(_cache_file(file_path), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if (meta.get("sheet_id") == sheet_id and meta.get("gid") == gid
+                and meta.get("mtime") == os.path.getmtime(file_path)):
+            return meta
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _write_cache_file(file_path: str, sheet_id: str, gid: str, etag: str, last_modified: str):
+    """Record the validators file_path was just generated from (best effort)"""
+    if not etag and not last_modified:
+        return
+    meta = {
+        "sheet_id": sheet_id,
+        "gid": gid,
+        "etag": etag,
+        "last_modified": last_modified,
+        "mtime": os.path.getmtime(file_path),
+    }
+    try:
+        with open(_cache_file(file_path), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    except OSError:
+        pass
+
+
+# Helper functions appended verbatim to every generated domain_prompts.py
+_UTILITY_CODE_FOOTER = '''def get_all_domains():
+    """Get list of all domain names"""
+    return list(DOMAIN_PROMPTS.keys())
+
+
+def get_topics_for_domain(domain):
+    """Get list of topics for a specific domain"""
+    return list(DOMAIN_PROMPTS.get(domain, {}).keys())
+
+
+def get_system_prompt(domain, topic):
+    """Get system prompt for a specific domain and topic"""
+    return DOMAIN_PROMPTS.get(domain, {}).get(topic, "")
+
+
+def build_expert_intro(domain, topic, language="vi"):
+    """Build expert introduction text for script generation
+    
+    Args:
+        domain: Domain name (e.g., "GIÁO DỤC/HACKS")
+        topic: Topic name (e.g., "Mẹo Vặt (Life Hacks) Độc đáo")
+        language: Language code ("vi" or "en")
+    
+    Returns:
+        Formatted expert introduction text
+    """
+    system_prompt = get_system_prompt(domain, topic)
+    
+    if not system_prompt:
+        return ""
+    
+    if language == "vi":
+        intro = f"""Tôi là chuyên gia trong lĩnh vực {domain}, chuyên về {topic}. 
+Tôi đã nhận ý tưởng từ bạn và sẽ biến nó thành kịch bản và câu chuyện theo yêu cầu của bạn. 
+
+{system_prompt}
+
+Kịch bản như sau:"""
+    else:
+        intro = f"""I am an expert in {domain}, specializing in {topic}. 
+I have received your idea and will turn it into a script and story according to your requirements.
+
+{system_prompt}
+
+Script as follows:"""
+    
+    return intro
+
+
+def get_all_prompts():
+    """Get all domain-topic-prompt combinations"""
+    result = []
+    for domain, topics in DOMAIN_PROMPTS.items():
+        for topic, prompt in topics.items():
+            result.append({
+                "domain": domain,
+                "topic": topic,
+                "system_prompt": prompt
+            })
+    return result
+
+
+def reload_prompts():
+    """
+    Hot reload prompts by reimporting the module
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    try:
+        import importlib
+        import sys
         
-        # Build nested dictionary
-        prompts = {}
-        row_count = 0
+        # Get the current module
+        current_module = sys.modules.get(__name__)
         
-        for row in csv_reader:
-            domain = row.get('Domain', '').strip()
-            topic = row.get('Topic', '').strip()
-            system_prompt = row.get('System Prompt', '').strip()
-            
-            # Skip empty rows
-            if not domain or not topic or not system_prompt:
-                continue
+        if current_module:
+            # Reload the module
+            importlib.reload(current_module)
+            return True, "Đã reload prompts thành công!"
+        else:
+            return False, "Không tìm thấy module để reload"
             
-            # Add to nested dict
-            if domain not in prompts:
-                prompts[domain] = {}
-            
-            prompts[domain][topic] = system_prompt
-            row_count += 1
-        
-        if row_count == 0:
-            return {}, "Không tìm thấy dữ liệu hợp lệ trong CSV"
-        
-        return prompts, ""
-        
-    except requests.exceptions.Timeout:
-        return {}, "Timeout - vui lòng kiểm tra kết nối internet"
-    
-    except requests.exceptions.RequestException as e:
-        return {}, f"Lỗi mạng: {str(e)}"
-    
     except Exception as e:
-        return {}, f"Lỗi không xác định: {str(e)}"
+        return False, f"Lỗi khi reload: {str(e)}"
+'''
 
 
 def generate_prompts_code(prompts: Dict[str, Dict[str, str]], sheet_url: str = None) -> str:
@@ -123,6 +321,10 @@ def generate_prompts_code(prompts: Dict[str, Dict[str, str]], sheet_url: str = N
     if sheet_url is None:
         sheet_url = DEFAULT_SHEETS_URL
     
+    # Serialize the mapping in one call: JSON objects of strings are valid
+    # Python dict literals, and json.dumps handles all the escaping
+    body = json.dumps(prompts, ensure_ascii=False, indent=4, sort_keys=True)
+    
     lines = [
         '# -*- coding: utf-8 -*-',
         '"""',
@@ -131,115 +333,12 @@ def generate_prompts_code(prompts: Dict[str, Dict[str, str]], sheet_url: str = N
         '"""',
         '',
         '# Domain → Topics → System Prompts mapping',
-        'DOMAIN_PROMPTS = {'
+        f'DOMAIN_PROMPTS = {body}',
+        '',
+        '',
+        _UTILITY_CODE_FOOTER,
     ]
     
-    # Sort domains for consistent output
-    for domain in sorted(prompts.keys()):
-        lines.append(f'    "{domain}": {{')
-        
-        # Sort topics within each domain
-        topics = prompts[domain]
-        for topic in sorted(topics.keys()):
-            prompt = topics[topic]
-            # Escape quotes and backslashes in prompt text
-            escaped_prompt = prompt.replace('\\', '\\\\').replace('"', '\\"')
-            lines.append(f'        "{topic}": "{escaped_prompt}",')
-        
-        lines.append('    },')
-    
-    lines.append('}')
-    lines.append('')
-    lines.append('')
-    
-    # Add utility functions
-    lines.append('def get_all_domains():')
-    lines.append('    """Get list of all domain names"""')
-    lines.append('    return list(DOMAIN_PROMPTS.keys())')
-    lines.append('')
-    lines.append('')
-    lines.append('def get_topics_for_domain(domain):')
-    lines.append('    """Get list of topics for a specific domain"""')
-    lines.append('    return list(DOMAIN_PROMPTS.get(domain, {}).keys())')
-    lines.append('')
-    lines.append('')
-    lines.append('def get_system_prompt(domain, topic):')
-    lines.append('    """Get system prompt for a specific domain and topic"""')
-    lines.append('    return DOMAIN_PROMPTS.get(domain, {}).get(topic, "")')
-    lines.append('')
-    lines.append('')
-    lines.append('def build_expert_intro(domain, topic, language="vi"):')
-    lines.append('    """Build expert introduction text for script generation')
-    lines.append('    ')
-    lines.append('    Args:')
-    lines.append('        domain: Domain name (e.g., "GIÁO DỤC/HACKS")')
-    lines.append('        topic: Topic name (e.g., "Mẹo Vặt (Life Hacks) Độc đáo")')
-    lines.append('        language: Language code ("vi" or "en")')
-    lines.append('    ')
-    lines.append('    Returns:')
-    lines.append('        Formatted expert introduction text')
-    lines.append('    """')
-    lines.append('    system_prompt = get_system_prompt(domain, topic)')
-    lines.append('    ')
-    lines.append('    if not system_prompt:')
-    lines.append('        return ""')
-    lines.append('    ')
-    lines.append('    if language == "vi":')
-    lines.append('        intro = f"""Tôi là chuyên gia trong lĩnh vực {domain}, chuyên về {topic}. ')
-    lines.append('Tôi đã nhận ý tưởng từ bạn và sẽ biến nó thành kịch bản và câu chuyện theo yêu cầu của bạn. ')
-    lines.append('')
-    lines.append('{system_prompt}')
-    lines.append('')
-    lines.append('Kịch bản như sau:"""')
-    lines.append('    else:')
-    lines.append('        intro = f"""I am an expert in {domain}, specializing in {topic}. ')
-    lines.append('I have received your idea and will turn it into a script and story according to your requirements.')
-    lines.append('')
-    lines.append('{system_prompt}')
-    lines.append('')
-    lines.append('Script as follows:"""')
-    lines.append('    ')
-    lines.append('    return intro')
-    lines.append('')
-    lines.append('')
-    lines.append('def get_all_prompts():')
-    lines.append('    """Get all domain-topic-prompt combinations"""')
-    lines.append('    result = []')
-    lines.append('    for domain, topics in DOMAIN_PROMPTS.items():')
-    lines.append('        for topic, prompt in topics.items():')
-    lines.append('            result.append({')
-    lines.append('                "domain": domain,')
-    lines.append('                "topic": topic,')
-    lines.append('                "system_prompt": prompt')
-    lines.append('            })')
-    lines.append('    return result')
-    lines.append('')
-    lines.append('')
-    lines.append('def reload_prompts():')
-    lines.append('    """')
-    lines.append('    Hot reload prompts by reimporting the module')
-    lines.append('    ')
-    lines.append('    Returns:')
-    lines.append('        tuple: (success: bool, message: str)')
-    lines.append('    """')
-    lines.append('    try:')
-    lines.append('        import importlib')
-    lines.append('        import sys')
-    lines.append('        ')
-    lines.append('        # Get the current module')
-    lines.append('        current_module = sys.modules.get(__name__)')
-    lines.append('        ')
-    lines.append('        if current_module:')
-    lines.append('            # Reload the module')
-    lines.append('            importlib.reload(current_module)')
-    lines.append('            return True, "Đã reload prompts thành công!"')
-    lines.append('        else:')
-    lines.append('            return False, "Không tìm thấy module để reload"')
-    lines.append('            ')
-    lines.append('    except Exception as e:')
-    lines.append('        return False, f"Lỗi khi reload: {str(e)}"')
-    lines.append('')
-    
     return '\n'.join(lines)
 
 
@@ -254,11 +353,24 @@ def update_prompts_file(file_path: str, sheet_url: str = None) -> Tuple[bool, st
     Returns:
         Tuple of (success, message)
     """
-    # Fetch prompts
-    prompts, error = fetch_prompts_from_sheets(sheet_url)
+    # Use default URL if not provided
+    if sheet_url is None:
+        sheet_url = DEFAULT_SHEETS_URL
+    
+    sheet_id, gid, error = extract_sheet_info(sheet_url)
+    if error:
+        return False, error
+    
+    # Fetch prompts; if the file was generated from the sheet's current
+    # version the server answers 304 and nothing is parsed or rewritten
+    meta = _read_cache_file(file_path, sheet_id, gid)
+    prompts, error, etag, last_modified = _fetch_sheet(
+        sheet_id, gid, meta.get("etag", ""), meta.get("last_modified", ""))
     
     if error:
         return False, error
+    if prompts is None:
+        return True, "Dữ liệu không thay đổi - prompts đã là bản mới nhất"
     
     # Generate new code
     new_code = generate_prompts_code(prompts, sheet_url)
@@ -267,6 +379,8 @@ def update_prompts_file(file_path: str, sheet_url: str = None) -> Tuple[bool, st
     try:
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(new_code)
+        _write_cache_file(file_path, sheet_id, gid, etag, last_modified)
+        _remember_prompts((sheet_id, gid), etag, last_modified, prompts)
         
         # Count domains and topics
         domain_count = len(prompts)
@@ -2,10 +2,30 @@
 from typing import Dict, Any, List, Optional
 import datetime, json, re, logging, sys
 from pathlib import Path
-from services.gemini_client import GeminiClient, MissingAPIKey
+from services.gemini_client import GeminiClient, GenerationCancelled, MissingAPIKey
+
+try:
+    # Optional: faster parser for the direct-parse strategy. Its
+    # JSONDecodeError subclasses json.JSONDecodeError, so handlers are shared
+    import orjson
+    _fast_loads = orjson.loads
+except ImportError:
+    _fast_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+# Patterns used by parse_llm_response_safe, compiled once
+_MD_JSON_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+_FENCE_RE = re.compile(r'\s*```(?:json)?\s*')
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+# What may follow a decoded object for it to count as the whole reply
+_JSON_TAIL_RE = re.compile(r'\s*(?:```\s*)?')
+# Characters a JSON document can start with (after whitespace)
+_JSON_START = frozenset('{["-0123456789tfn')
+# BOM and zero-width space, dropped in one str.translate pass
+_INVISIBLE_CHARS = str.maketrans('', '', '\ufeff\u200b')
+_DECODER = json.JSONDecoder()
+
 def parse_llm_response_safe(response_text: str, source: str = "LLM") -> Dict[str, Any]:
     """
     Robust JSON parser with 5 fallback strategies to handle malformed LLM responses.
@@ -20,53 +40,63 @@ def parse_llm_response_safe(response_text: str, source: str = "LLM") -> Dict[str
     Raises:
         json.JSONDecodeError: If all parsing strategies fail
     """
-    if not response_text or not response_text.strip():
+    stripped = response_text.lstrip() if response_text else ""
+    if not stripped:
         raise ValueError(f"Empty response from {source}")
     
-    # Strategy 1: Direct JSON parse
-    try:
-        return json.loads(response_text)
-    except json.JSONDecodeError as e:
-        logger.debug(f"{source} Strategy 1 failed (direct parse): {e}")
+    # Strategy 1: Direct JSON parse. Skipped when the text cannot be JSON
+    # (e.g. starts with a ``` fence) so the common fenced reply doesn't pay
+    # for a guaranteed JSONDecodeError
+    if stripped[0] in _JSON_START:
+        try:
+            return _fast_loads(stripped)
+        except json.JSONDecodeError as e:
+            logger.debug("%s Strategy 1 failed (direct parse): %s", source, e)
+    
+    # Strategy 1b: Decode the first object in place. raw_decode() stops at the
+    # end of that object, so prose or a fence before it needs no regex or
+    # rfind('}') scan. Only accepted if nothing but a closing fence follows;
+    # otherwise it may be an example object in prose ahead of the real payload
+    start = stripped.find('{')
+    if start != -1:
+        try:
+            obj, end = _DECODER.raw_decode(stripped, start)
+            if _JSON_TAIL_RE.fullmatch(stripped, end):
+                return obj
+            logger.debug("%s Strategy 1b skipped (text after first object)", source)
+        except json.JSONDecodeError as e:
+            logger.debug("%s Strategy 1b failed (raw decode): %s", source, e)
     
     # Strategy 2: Extract from markdown code blocks
     try:
         # Remove markdown code blocks (```json ... ``` or ``` ... ```)
-        if "```" in response_text:
+        if "```" in stripped:
             # Extract content between code blocks
-            pattern = r'```(?:json)?\s*(.*?)\s*```'
-            matches = re.findall(pattern, response_text, re.DOTALL)
-            if matches:
-                cleaned = matches[0].strip()
+            match = _MD_JSON_RE.search(stripped)
+            if match:
+                cleaned = match.group(1).strip()
                 return json.loads(cleaned)
     except json.JSONDecodeError as e:
-        logger.debug(f"{source} Strategy 2 failed (markdown extraction): {e}")
+        logger.debug("%s Strategy 2 failed (markdown extraction): %s", source, e)
     
     # Strategy 3: Fix common issues
     try:
-        cleaned = response_text.strip()
-        
-        # Remove BOM if present
-        if cleaned.startswith('\ufeff'):
-            cleaned = cleaned[1:]
-        
-        # Remove invisible characters
-        cleaned = cleaned.replace('\u200b', '')
+        # Remove BOM and invisible characters
+        cleaned = stripped.translate(_INVISIBLE_CHARS).strip()
         
-        # Remove markdown code blocks
-        cleaned = re.sub(r'```(?:json)?\s*', '', cleaned)
-        cleaned = re.sub(r'\s*```', '', cleaned)
+        # Remove markdown code blocks (opening and closing fences in one pass)
+        cleaned = _FENCE_RE.sub('', cleaned)
         
         # Replace single quotes with double quotes (simple approach)
         if "'" in cleaned and cleaned.count("'") > cleaned.count('"'):
             cleaned = cleaned.replace("'", '"')
         
         # Remove trailing commas before } or ]
-        cleaned = re.sub(r',(\s*[}\]])', r'\1', cleaned)
+        cleaned = _TRAILING_COMMA_RE.sub(r'\1', cleaned)
         
         return json.loads(cleaned)
     except json.JSONDecodeError as e:
-        logger.debug(f"{source} Strategy 3 failed (common fixes): {e}")
+        logger.debug("%s Strategy 3 failed (common fixes): %s", source, e)
     
     # Strategy 4: Find JSON by boundaries
     try:
@@ -82,16 +112,18 @@ def parse_llm_response_safe(response_text: str, source: str = "LLM") -> Dict[str
                 return json.loads(json_str)
             except json.JSONDecodeError:
                 # Apply fixes from strategy 3
-                json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
+                json_str = _TRAILING_COMMA_RE.sub(r'\1', json_str)
                 return json.loads(json_str)
     except json.JSONDecodeError as e:
-        logger.debug(f"{source} Strategy 4 failed (boundary extraction): {e}")
+        logger.debug("%s Strategy 4 failed (boundary extraction): %s", source, e)
     
     # Strategy 5: Detailed error logging and re-raise
-    logger.error(f"{source} All parsing strategies failed!")
-    logger.error(f"Response length: {len(response_text)} characters")
-    logger.error(f"First 500 chars: {response_text[:500]}")
-    logger.error(f"Last 500 chars: {response_text[-500:]}")
+    # The dump slices the response, so it is only built when ERROR is enabled
+    if logger.isEnabledFor(logging.ERROR):
+        logger.error("%s All parsing strategies failed!", source)
+        logger.error("Response length: %d characters", len(response_text))
+        logger.error("First 500 chars: %s", response_text[:500])
+        logger.error("Last 500 chars: %s", response_text[-500:])
     
     # Try one last time to get a better error message
     try:
@@ -283,13 +315,18 @@ Output MUST be valid JSON with this structure:
   ]
 }}"""
 
-def build_outline(cfg:Dict[str,Any])->Dict[str,Any]:
+def build_outline(cfg:Dict[str,Any], progress=None, should_continue=None)->Dict[str,Any]:
     """
     Build script outline with scenes, social media, and character bible.
     This is the main entry point for script generation.
     
     Args:
         cfg: Configuration dict with video parameters
+        progress: Optional callable(str); when given, the script reply is
+            streamed and progress messages are reported while it arrives
+        should_continue: Optional callable() -> bool, polled while the script
+            and social replies stream; returning False aborts with
+            GenerationCancelled
         
     Returns:
         Dict containing script_json, scenes, social_media, etc.
@@ -305,7 +342,9 @@ def build_outline(cfg:Dict[str,Any])->Dict[str,Any]:
     
     client = GeminiClient()
     sys_prompt = _build_system_prompt(cfg, sceneCount, models_json, product_count)
-    raw = client.generate(sys_prompt, "Return ONLY the JSON object. No prose.", timeout=240)
+    on_progress = (lambda n: progress(f"Đang nhận kịch bản... {n} ký tự")) if progress else None
+    raw = client.generate(sys_prompt, "Return ONLY the JSON object. No prose.", timeout=240,
+                          on_progress=on_progress, should_continue=should_continue)
     script_json = _try_parse_json(raw)
 
     scenes = script_json.get("scenes", [])
@@ -341,9 +380,12 @@ def build_outline(cfg:Dict[str,Any])->Dict[str,Any]:
     social_media = {"versions": []}
     try:
         social_prompt = _build_social_media_prompt(cfg, outline_vi)
-        social_raw = client.generate(social_prompt, "Return ONLY valid JSON.", timeout=120)
+        social_raw = client.generate(social_prompt, "Return ONLY valid JSON.", timeout=120,
+                                     should_continue=should_continue)
         social_json = _try_parse_json(social_raw)
         social_media = social_json if "versions" in social_json else {"versions": []}
+    except GenerationCancelled:
+        raise  # stopped by the user; not a reason to fall back to default versions
     except Exception as e:
         logger.warning(f"Failed to generate social media content: {e}")
         # Fallback: create default versions
@@ -1,3 +1,4 @@
+import functools
 import json
 
 from PyQt5.QtCore import Qt
@@ -7,6 +8,7 @@ from PyQt5.QtWidgets import (
     QDialog,
     QFrame,
     QLabel,
+    QPlainTextEdit,
     QPushButton,
     QScrollArea,
     QTabWidget,
@@ -16,62 +18,167 @@ from PyQt5.QtWidgets import (
 )
 
 
+@functools.lru_cache(maxsize=32)
+def _darken_color(hex_color: str, factor: float = 0.8) -> str:
+    """Darken a hex color by a factor (0.0 to 1.0)"""
+    # One parse for all three channels, then split with shifts
+    rgb = int(hex_color.lstrip('#'), 16)
+
+    # Darken
+    r = int((rgb >> 16) * factor)
+    g = int((rgb >> 8 & 0xFF) * factor)
+    b = int((rgb & 0xFF) * factor)
+
+    # Convert back to hex
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# Target-language prompt lookup order ('vi' is shown separately)
+_TGT_LANGS = ('en', 'ja', 'ko', 'zh', 'fr', 'de', 'es')
+
+# Section accent (border) color -> background color
+_SECTION_COLORS = {
+    "#00ACC1": "#E1F5FE",
+    "#9C27B0": "#F3E5F5",
+    "#4CAF50": "#E8F5E9",
+    "#FF9800": "#FFF3E0",
+    "#2196F3": "#E3F2FD",
+    "#FFC107": "#FFF8E1",
+    "#009688": "#E0F2F1",
+}
+
+
+def _build_stylesheet():
+    """Dialog-wide QSS; sections pick their colors through the accent property"""
+    rules = ["""
+        QFrame#section {
+            border-radius: 8px;
+            padding: 12px;
+        }
+        QFrame#section QTextEdit, QLabel#sectionText {
+            background: white;
+            border: 1px solid #ddd;
+            border-radius: 4px;
+            padding: 8px;
+            font-size: 11px;
+        }
+        QPushButton#copyButton {
+            color: white;
+            border: none;
+            border-radius: 4px;
+            padding: 6px 12px;
+            font-weight: bold;
+        }
+        QLabel#placeholder {
+            color: #999;
+            font-size: 13px;
+            padding: 40px;
+        }
+        QPushButton#closeButton {
+            background: #1E88E5;
+            color: white;
+            border: none;
+            border-radius: 18px;
+            font-weight: 700;
+            font-size: 13px;
+        }
+        QPushButton#closeButton:hover { background: #2196F3; }
+    """]
+    for border_color, bg_color in _SECTION_COLORS.items():
+        section = f'QFrame#section[accent="{border_color.lstrip("#")}"]'
+        rules.append(f"""
+        {section} {{
+            background: {bg_color};
+            border: 2px solid {border_color};
+        }}
+        {section} QLabel#sectionTitle {{ color: {border_color}; }}
+        {section} QPushButton#copyButton {{ background: {border_color}; }}
+        {section} QPushButton#copyButton:hover {{ background: {_darken_color(border_color)}; }}
+    """)
+    return "".join(rules)
+
+
+# Parsed once by Qt for the whole dialog instead of once per section widget
+_STYLESHEET = _build_stylesheet()
+
+
 class PromptViewer(QDialog):
-    def __init__(self, prompt_json: str, dialogues=None, parent=None):
+    def __init__(self, prompt_json: str = None, dialogues=None, parent=None, data: dict = None):
         super().__init__(parent)
         self.setWindowTitle("Prompts - Cảnh")
         self.resize(900, 650)
+        self.setStyleSheet(_STYLESHEET)
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(8, 8, 8, 8)
 
         tabs = QTabWidget()
         tabs.setFont(QFont("Segoe UI", 11))
+        self._tabs = tabs
 
-        # Parse JSON
-        try:
-            data = json.loads(prompt_json)
-        except Exception:
-            data = {}
+        # Parse JSON, unless the caller passed the dict it already has
+        if data is None:
+            try:
+                data = json.loads(prompt_json)
+            except Exception:
+                data = {}
 
-        # Tab 1: Prompts
+        # Tab 1: Prompts (shown first, so built now)
         tab1 = self._build_prompts_tab(data)
         tabs.addTab(tab1, "📝 Prompts")
 
-        # Tab 2: Details
-        tab2 = self._build_details_tab(data)
-        tabs.addTab(tab2, "🎬 Chi tiết")
+        # Tab 2: Details and Tab 3: Raw JSON start as empty pages and are
+        # built the first time they are shown
+        def build_details():
+            return self._build_details_tab(data)
 
-        # Tab 3: Raw JSON
-        tab3 = QWidget()
-        layout3 = QVBoxLayout(tab3)
-        layout3.setContentsMargins(8, 8, 8, 8)
-        ed = QTextEdit()
-        ed.setReadOnly(True)
-        ed.setPlainText(prompt_json)
-        ed.setFont(QFont("Courier New", 10))
-        layout3.addWidget(ed)
-        tabs.addTab(tab3, "📄 JSON")
+        def build_json():
+            return self._build_json_tab(prompt_json, data)
+
+        self._tab_builders = {
+            tabs.addTab(self._lazy_page(), "🎬 Chi tiết"): build_details,
+            tabs.addTab(self._lazy_page(), "📄 JSON"): build_json,
+        }
+        tabs.currentChanged.connect(self._on_tab_changed)
 
         layout.addWidget(tabs)
 
         # Close button
         btn_close = QPushButton("Đóng")
         btn_close.setMinimumHeight(36)
-        btn_close.setStyleSheet("""
-            QPushButton {
-                background: #1E88E5;
-                color: white;
-                border: none;
-                border-radius: 18px;
-                font-weight: 700;
-                font-size: 13px;
-            }
-            QPushButton:hover { background: #2196F3; }
-        """)
+        btn_close.setObjectName("closeButton")
         btn_close.clicked.connect(self.accept)
         layout.addWidget(btn_close)
 
+    def _lazy_page(self):
+        """Empty tab page that receives its content on first show"""
+        page = QWidget()
+        page_layout = QVBoxLayout(page)
+        page_layout.setContentsMargins(0, 0, 0, 0)
+        return page
+
+    def _on_tab_changed(self, index):
+        """Build a lazy tab's content the first time it becomes current"""
+        builder = self._tab_builders.pop(index, None)
+        if builder is not None:
+            self._tabs.widget(index).layout().addWidget(builder())
+
+    def _build_json_tab(self, prompt_json, data):
+        """Build raw JSON tab; serializes data if no JSON text was given"""
+        if prompt_json is None:
+            prompt_json = json.dumps(data, ensure_ascii=False, indent=2)
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(8, 8, 8, 8)
+        # Plain-text editor: no rich-text layout, and no undo history for read-only text
+        ed = QPlainTextEdit()
+        ed.setReadOnly(True)
+        ed.setUndoRedoEnabled(False)
+        ed.setFont(QFont("Courier New", 10))
+        ed.setPlainText(prompt_json)
+        layout.addWidget(ed)
+        return widget
+
     def _build_prompts_tab(self, data):
         """Build prompts tab with Vietnamese and target language prompts"""
         widget = QWidget()
@@ -93,20 +200,17 @@ class PromptViewer(QDialog):
         loc = data.get('localization', {})
         vi_prompt = loc.get('vi', {}).get('prompt', '')
 
-        # Get target language prompt (usually 'en')
-        tgt_prompt = ''
-        for lang_key in ['en', 'ja', 'ko', 'zh', 'fr', 'de', 'es']:
-            if lang_key in loc and lang_key != 'vi':
-                tgt_prompt = loc.get(lang_key, {}).get('prompt', '')
-                if tgt_prompt:
-                    break
+        # Get target language prompt (usually 'en'): first language with one
+        tgt_prompt = next(
+            (loc[k]['prompt'] for k in _TGT_LANGS if k in loc and loc[k].get('prompt')),
+            '',
+        )
 
         # Vietnamese prompt section
         if vi_prompt:
             vi_frame = self._create_prompt_section(
                 "📝 Prompt Ảnh (Vietnamese)",
                 vi_prompt,
-                "#E1F5FE",
                 "#00ACC1"
             )
             content_layout.addWidget(vi_frame)
@@ -116,7 +220,6 @@ class PromptViewer(QDialog):
             tgt_frame = self._create_prompt_section(
                 "🎬 Prompt Video (Target)",
                 tgt_prompt,
-                "#F3E5F5",
                 "#9C27B0"
             )
             content_layout.addWidget(tgt_frame)
@@ -125,7 +228,7 @@ class PromptViewer(QDialog):
         if not vi_prompt and not tgt_prompt:
             placeholder = QLabel("Không tìm thấy prompts trong JSON")
             placeholder.setAlignment(Qt.AlignCenter)
-            placeholder.setStyleSheet("color: #999; font-size: 13px; padding: 40px;")
+            placeholder.setObjectName("placeholder")
             content_layout.addWidget(placeholder)
 
         content_layout.addStretch()
@@ -134,17 +237,11 @@ class PromptViewer(QDialog):
 
         return widget
 
-    def _create_prompt_section(self, title, text, bg_color, border_color):
+    def _create_prompt_section(self, title, text, border_color):
         """Create a styled prompt section with copy button"""
         frame = QFrame()
-        frame.setStyleSheet(f"""
-            QFrame {{
-                background: {bg_color};
-                border: 2px solid {border_color};
-                border-radius: 8px;
-                padding: 12px;
-            }}
-        """)
+        frame.setObjectName("section")
+        frame.setProperty("accent", border_color.lstrip('#'))
 
         layout = QVBoxLayout(frame)
         layout.setSpacing(8)
@@ -153,7 +250,7 @@ class PromptViewer(QDialog):
         # Title
         lbl_title = QLabel(title)
         lbl_title.setFont(QFont("Segoe UI", 12, QFont.Bold))
-        lbl_title.setStyleSheet(f"color: {border_color};")
+        lbl_title.setObjectName("sectionTitle")
         layout.addWidget(lbl_title)
 
         # Text edit
@@ -162,35 +259,12 @@ class PromptViewer(QDialog):
         text_edit.setReadOnly(True)
         text_edit.setMinimumHeight(120)
         text_edit.setMaximumHeight(200)
-        text_edit.setStyleSheet("""
-            QTextEdit {
-                background: white;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                padding: 8px;
-                font-size: 11px;
-            }
-        """)
         layout.addWidget(text_edit)
 
         # Copy button
         btn_copy = QPushButton("📋 Copy")
         btn_copy.setMaximumWidth(120)
-        # Create darker shade for hover effect
-        hover_color = self._darken_color(border_color)
-        btn_copy.setStyleSheet(f"""
-            QPushButton {{
-                background: {border_color};
-                color: white;
-                border: none;
-                border-radius: 4px;
-                padding: 6px 12px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background: {hover_color};
-            }}
-        """)
+        btn_copy.setObjectName("copyButton")
         btn_copy.clicked.connect(lambda: self._copy_to_clipboard(text))
         layout.addWidget(btn_copy)
 
@@ -223,37 +297,38 @@ class PromptViewer(QDialog):
             bg_music = audio.get('background_music', {})
 
             audio_text = []
+            # One multi-line string per block rather than one append per line
             if voiceover:
-                audio_text.append("🎙️ VOICEOVER:")
-                audio_text.append(f"  • Language: {voiceover.get('language', 'N/A')}")
-                audio_text.append(f"  • Provider: {voiceover.get('tts_provider', 'N/A')}")
                 voice_name = voiceover.get('voice_name', voiceover.get('voice_id', 'N/A'))
-                audio_text.append(f"  • Voice: {voice_name}")
-                audio_text.append(f"  • Style: {voiceover.get('speaking_style', 'N/A')}")
+                audio_text.append(
+                    "🎙️ VOICEOVER:\n"
+                    f"  • Language: {voiceover.get('language', 'N/A')}\n"
+                    f"  • Provider: {voiceover.get('tts_provider', 'N/A')}\n"
+                    f"  • Voice: {voice_name}\n"
+                    f"  • Style: {voiceover.get('speaking_style', 'N/A')}"
+                )
 
                 prosody = voiceover.get('prosody', {})
                 if prosody:
-                    rate = prosody.get('rate', 1.0)
-                    rate_desc = prosody.get('rate_description', 'normal')
-                    audio_text.append(f"  • Rate: {rate:.2f}x ({rate_desc})")
-
-                    pitch = int(prosody.get('pitch', 0))
-                    pitch_desc = prosody.get('pitch_description', 'neutral')
-                    audio_text.append(f"  • Pitch: {pitch:+d}st ({pitch_desc})")
-
-                    expr = prosody.get('expressiveness', 0.5)
-                    expr_desc = prosody.get('expressiveness_description', 'moderate')
-                    audio_text.append(f"  • Expressiveness: {expr:.2f} ({expr_desc})")
+                    audio_text.append(
+                        f"  • Rate: {prosody.get('rate', 1.0):.2f}x "
+                        f"({prosody.get('rate_description', 'normal')})\n"
+                        f"  • Pitch: {int(prosody.get('pitch', 0)):+d}st "
+                        f"({prosody.get('pitch_description', 'neutral')})\n"
+                        f"  • Expressiveness: {prosody.get('expressiveness', 0.5):.2f} "
+                        f"({prosody.get('expressiveness_description', 'moderate')})"
+                    )
 
             if bg_music:
-                audio_text.append("")
-                audio_text.append("🎵 BACKGROUND MUSIC:")
-                audio_text.append(f"  • Type: {bg_music.get('type', 'N/A')}")
-                audio_text.append(f"  • Mood: {bg_music.get('mood', 'N/A')}")
-                audio_text.append(f"  • Volume: {bg_music.get('volume', 0.3):.1f}")
+                audio_text.append(
+                    "\n🎵 BACKGROUND MUSIC:\n"
+                    f"  • Type: {bg_music.get('type', 'N/A')}\n"
+                    f"  • Mood: {bg_music.get('mood', 'N/A')}\n"
+                    f"  • Volume: {bg_music.get('volume', 0.3):.1f}"
+                )
 
             if audio_text:
-                details.append(("🎙️ Audio Settings", "\n".join(audio_text), "#E8F5E9", "#4CAF50"))
+                details.append(("🎙️ Audio Settings", "\n".join(audio_text), "#4CAF50"))
 
         # Camera direction
         camera_dir = data.get('camera_direction', [])
@@ -263,25 +338,26 @@ class PromptViewer(QDialog):
             for i, segment in enumerate(camera_dir, 1):
                 cam_text.append(f"\n  {i}. {segment.get('t', 'N/A')}:")
                 cam_text.append(f"     {segment.get('shot', 'N/A')}")
-            details.append(("🎥 Camera Direction", "\n".join(cam_text), "#FFF3E0", "#FF9800"))
+            details.append(("🎥 Camera Direction", "\n".join(cam_text), "#FF9800"))
 
         # Character details
         char_details = data.get('character_details', '')
         if char_details:
-            details.append(("👥 Character Details", char_details, "#F3E5F5", "#9C27B0"))
+            details.append(("👥 Character Details", char_details, "#9C27B0"))
 
         # Setting details
         setting = data.get('setting_details', '')
         if setting:
-            details.append(("🎨 Visual Style", setting, "#E3F2FD", "#2196F3"))
+            details.append(("🎨 Visual Style", setting, "#2196F3"))
 
         # Constraints
         constraints = data.get('constraints', {})
         if constraints:
-            const_text = []
-            const_text.append(f"⏱️ Duration: {constraints.get('duration_seconds', 'N/A')} seconds")
-            const_text.append(f"📐 Aspect Ratio: {constraints.get('aspect_ratio', 'N/A')}")
-            const_text.append(f"🖥️ Resolution: {constraints.get('resolution', 'N/A')}")
+            const_text = [
+                f"⏱️ Duration: {constraints.get('duration_seconds', 'N/A')} seconds\n"
+                f"📐 Aspect Ratio: {constraints.get('aspect_ratio', 'N/A')}\n"
+                f"🖥️ Resolution: {constraints.get('resolution', 'N/A')}"
+            ]
 
             style_tags = constraints.get('visual_style_tags', [])
             if style_tags:
@@ -293,28 +369,29 @@ class PromptViewer(QDialog):
                 lens = camera.get('lens_hint', 'N/A')
                 const_text.append(f"📹 Camera: {fps} fps, {lens}")
 
-            details.append(("⚙️ Constraints", "\n".join(const_text), "#FFF8E1", "#FFC107"))
+            details.append(("⚙️ Constraints", "\n".join(const_text), "#FFC107"))
 
         # Domain context
         domain_ctx = data.get('domain_context', {})
         if domain_ctx:
-            dom_text = []
-            dom_text.append(f"📚 Domain: {domain_ctx.get('domain', 'N/A')}")
-            dom_text.append(f"📖 Topic: {domain_ctx.get('topic', 'N/A')}")
+            dom_text = [
+                f"📚 Domain: {domain_ctx.get('domain', 'N/A')}\n"
+                f"📖 Topic: {domain_ctx.get('topic', 'N/A')}"
+            ]
             if domain_ctx.get('expertise_intro'):
                 dom_text.append(f"\n{domain_ctx.get('expertise_intro')}")
-            details.append(("📚 Domain Context", "\n".join(dom_text), "#E0F2F1", "#009688"))
+            details.append(("📚 Domain Context", "\n".join(dom_text), "#009688"))
 
         # Add all detail sections
-        for title, text, bg_color, border_color in details:
-            frame = self._create_detail_section(title, text, bg_color, border_color)
+        for title, text, border_color in details:
+            frame = self._create_detail_section(title, text, border_color)
             content_layout.addWidget(frame)
 
         # If no details, show placeholder
         if not details:
             placeholder = QLabel("Không có chi tiết bổ sung")
             placeholder.setAlignment(Qt.AlignCenter)
-            placeholder.setStyleSheet("color: #999; font-size: 13px; padding: 40px;")
+            placeholder.setObjectName("placeholder")
             content_layout.addWidget(placeholder)
 
         content_layout.addStretch()
@@ -323,17 +400,11 @@ class PromptViewer(QDialog):
 
         return widget
 
-    def _create_detail_section(self, title, text, bg_color, border_color):
+    def _create_detail_section(self, title, text, border_color):
         """Create a styled detail section"""
         frame = QFrame()
-        frame.setStyleSheet(f"""
-            QFrame {{
-                background: {bg_color};
-                border: 2px solid {border_color};
-                border-radius: 8px;
-                padding: 12px;
-            }}
-        """)
+        frame.setObjectName("section")
+        frame.setProperty("accent", border_color.lstrip('#'))
 
         layout = QVBoxLayout(frame)
         layout.setSpacing(8)
@@ -342,44 +413,18 @@ class PromptViewer(QDialog):
         # Title
         lbl_title = QLabel(title)
         lbl_title.setFont(QFont("Segoe UI", 11, QFont.Bold))
-        lbl_title.setStyleSheet(f"color: {border_color};")
+        lbl_title.setObjectName("sectionTitle")
         layout.addWidget(lbl_title)
 
         # Text
         lbl_text = QLabel(text)
         lbl_text.setWordWrap(True)
         lbl_text.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        lbl_text.setStyleSheet("""
-            QLabel {
-                background: white;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                padding: 8px;
-                font-size: 11px;
-            }
-        """)
+        lbl_text.setObjectName("sectionText")
         layout.addWidget(lbl_text)
 
         return frame
 
-    def _darken_color(self, hex_color: str, factor: float = 0.8) -> str:
-        """Darken a hex color by a factor (0.0 to 1.0)"""
-        # Remove # if present
-        hex_color = hex_color.lstrip('#')
-
-        # Convert to RGB
-        r = int(hex_color[0:2], 16)
-        g = int(hex_color[2:4], 16)
-        b = int(hex_color[4:6], 16)
-
-        # Darken
-        r = int(r * factor)
-        g = int(g * factor)
-        b = int(b * factor)
-
-        # Convert back to hex
-        return f"#{r:02x}{g:02x}{b:02x}"
-
     def _copy_to_clipboard(self, text: str):
         """Copy text to clipboard"""
         try:
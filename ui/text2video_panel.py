@@ -1671,7 +1671,7 @@ class Text2VideoPane(QWidget):
         
         j=build_prompt_json(row+1, vi, tgt, lang_code, self.cb_ratio.currentText(), self.cb_style.currentText(), voice_settings=voice_settings, location_context=location_ctx)
         from ui.prompt_viewer import PromptViewer
-        dlg = PromptViewer(json.dumps(j, ensure_ascii=False, indent=2), None, self); dlg.exec_()
+        dlg = PromptViewer(None, None, self, data=j); dlg.exec_()
 
 
     def _on_job_card(self, data:dict):
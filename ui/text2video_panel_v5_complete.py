@@ -1289,10 +1289,7 @@ class Text2VideoPanelV5(QWidget):
             
             try:
                 from ui.prompt_viewer import PromptViewer
-                dlg = PromptViewer(
-                    json.dumps(j, ensure_ascii=False, indent=2),
-                    None, self
-                )
+                dlg = PromptViewer(None, None, self, data=j)
                 dlg.exec_()
             except ImportError:
                 self._append_log("[WARN] PromptViewer not available")
@@ -1176,6 +1176,9 @@ class VideoBanHangPanel(QWidget):
             except:
                 first_model_json = str(models[0]["data"])
 
+        from services.core.config import load as load_cfg
+        app_cfg = load_cfg()
+
         return {
             "project_name": (self.ed_name.text() or "").strip() or svc.default_project_name(),
             "idea": self.ed_idea.toPlainText(),
@@ -1196,6 +1199,11 @@ class VideoBanHangPanel(QWidget):
             "product_count": len(self.prod_paths),
             "models": models,
             "model_paths": model_paths,
+            # Opt-in reuse of the last outline for an identical config
+            # ("script_cache": true in the app config)
+            "use_script_cache": bool(app_cfg.get("script_cache", False)),
+            # ...and of a near-identical one ("script_semantic_cache": true)
+            "use_semantic_cache": bool(app_cfg.get("script_semantic_cache", False)),
         }
 
     def _append_log(self, msg):
@@ -57,6 +57,24 @@ THUMBNAIL_SIZE = 72
 MODEL_IMG = 128
 RATE_LIMIT_DELAY_SEC = 10.0
 
+# Script error classification: marker in the worker's message -> kind.
+# One regex scan instead of a substring check per marker. Prefix markers
+# (exception type names) only count at the start of the message
+_SCRIPT_ERROR_KINDS = {
+    "JSONDecodeError": "json",
+    "Failed to parse JSON": "json",
+    "MissingAPIKey:": "api_key",
+}
+_SCRIPT_ERROR_PREFIXES = ("MissingAPIKey:",)
+_SCRIPT_ERROR_RE = re.compile("|".join(
+    ("^" if marker in _SCRIPT_ERROR_PREFIXES else "") + re.escape(marker)
+    for marker in _SCRIPT_ERROR_KINDS
+))
+# The worker reports positions in Vietnamese ("dòng 3, cột 7"), raw
+# exceptions in English ("line 3 column 7")
+_ERROR_LINE_RE = re.compile(r'(?:line|dòng) (\d+)')
+_ERROR_COL_RE = re.compile(r'(?:column|cột) (\d+)')
+
 # V5 Button Styles
 BTN_PRIMARY = """
     QPushButton {
@@ -993,6 +1011,9 @@ class VideoBanHangV5(QWidget):
                 except:
                     first_model_json = str(models[0]["data"])
         
+        from services.core.config import load as load_cfg
+        app_cfg = load_cfg()
+        
         return {
             "project_name": (self.ed_name.text() or "").strip() or (svc.default_project_name() if svc else "Project"),
             "idea": self.ed_idea.toPlainText(),
@@ -1011,6 +1032,11 @@ class VideoBanHangV5(QWidget):
             "product_count": len(self.prod_paths),
             "models": models,
             "model_paths": model_paths,
+            # Opt-in reuse of the last outline for an identical config
+            # ("script_cache": true in the app config)
+            "use_script_cache": bool(app_cfg.get("script_cache", False)),
+            # ...and of a near-identical one ("script_semantic_cache": true)
+            "use_semantic_cache": bool(app_cfg.get("script_semantic_cache", False)),
         }
     
     def _append_log(self, msg):
@@ -1151,11 +1177,14 @@ class VideoBanHangV5(QWidget):
         FIX for Issue #7: Better error messages and recovery options
         """
         
+        match = _SCRIPT_ERROR_RE.search(error_msg)
+        kind = _SCRIPT_ERROR_KINDS[match.group(0)] if match else None
+        
         # Check for JSON-related errors
-        if "JSONDecodeError" in error_msg or "Failed to parse JSON" in error_msg:
+        if kind == "json":
             # Extract key information
-            line_match = re.search(r'line (\d+)', error_msg)
-            col_match = re.search(r'column (\d+)', error_msg)
+            line_match = _ERROR_LINE_RE.search(error_msg)
+            col_match = _ERROR_COL_RE.search(error_msg)
             
             # Build user-friendly message
             title = "❌ Lỗi Phân Tích Kịch Bản (Issue #7)"
@@ -1221,7 +1250,7 @@ class VideoBanHangV5(QWidget):
                 QTimer.singleShot(1000, self._on_write_script)
                 return
         
-        elif error_msg.startswith("MissingAPIKey:"):
+        elif kind == "api_key":
             QMessageBox.warning(
                 self, "Thiếu API Key",
                 "Chưa nhập Google API Key.\n\n"
@@ -4,11 +4,37 @@ Material Design Ripple Button
 Implements ripple effect animation on click
 """
 
+import time
+
 from PyQt5.QtWidgets import QPushButton
-from PyQt5.QtCore import QPropertyAnimation, QEasingCurve, QRect, QTimer, pyqtProperty
-from PyQt5.QtGui import QPainter, QColor, QPainterPath
+from PyQt5.QtCore import QRect, QRectF, QTimer
+from PyQt5.QtGui import QPainter, QColor, QPainterPath, QPixmap
 from PyQt5.QtCore import Qt, QPoint
 
+RIPPLE_DURATION = 0.6  # seconds
+RIPPLE_TEXTURE_SIZE = 256  # px; scaled to the ripple each frame
+EASE_STEPS = 1024  # under a pixel of error even on wide buttons
+
+# OutCubic sampled once at import; _tick does a table lookup instead of the pow
+_EASE_OUT_CUBIC = tuple(1.0 - (1.0 - i / EASE_STEPS) ** 3 for i in range(EASE_STEPS + 1))
+
+_ripple_textures = {}  # QColor.rgba() -> QPixmap
+
+def _ripple_texture(color):
+    """Pre-rendered antialiased disc in color, shared by all buttons using it"""
+    pix = _ripple_textures.get(color.rgba())
+    if pix is None:
+        pix = QPixmap(RIPPLE_TEXTURE_SIZE, RIPPLE_TEXTURE_SIZE)
+        pix.fill(Qt.transparent)
+        painter = QPainter(pix)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setBrush(color)
+        painter.setPen(Qt.NoPen)
+        painter.drawEllipse(0, 0, RIPPLE_TEXTURE_SIZE, RIPPLE_TEXTURE_SIZE)
+        painter.end()
+        _ripple_textures[color.rgba()] = pix
+    return pix
+
 class RippleButton(QPushButton):
     """QPushButton with Material Design ripple effect"""
     
@@ -16,9 +42,17 @@ class RippleButton(QPushButton):
         super().__init__(*args, **kwargs)
         self._ripple_radius = 0
         self._ripple_pos = QPoint()
-        self._ripple_animation = None
+        self._max_radius = 0
+        self._ripple_t0 = 0.0
         self._ripple_color = QColor(255, 255, 255, 80)
+        self._clip_path = QPainterPath()
+        self._ripple_pix = None
         
+        # Plain frame timer; the radius is a Python float, not a Qt property
+        self._ripple_timer = QTimer(self)
+        self._ripple_timer.setInterval(16)  # one 60 fps frame
+        self._ripple_timer.timeout.connect(self._tick)
+    
     def mousePressEvent(self, event):
         """Start ripple animation on mouse press"""
         self._ripple_pos = event.pos()
@@ -27,46 +61,61 @@ class RippleButton(QPushButton):
     
     def _start_ripple(self):
         """Start the ripple animation"""
+        # A new press restarts the ripple; wipe the old one wherever it was
+        if self._ripple_radius > 0:
+            self._ripple_radius = 0
+            self.update()
+        
         # Calculate max radius (corner to corner)
-        max_radius = max(self.width(), self.height()) * 1.5
+        self._max_radius = max(self.width(), self.height()) * 1.5
+        
+        # Clip to button shape; built once per ripple instead of every frame
+        self._clip_path = QPainterPath()
+        self._clip_path.addRoundedRect(QRectF(self.rect()), 20, 20)  # Match button border-radius
         
-        # Create animation
-        self._ripple_animation = QPropertyAnimation(self, b"ripple_radius")
-        self._ripple_animation.setDuration(600)  # 600ms duration
-        self._ripple_animation.setStartValue(0)
-        self._ripple_animation.setEndValue(max_radius)
-        self._ripple_animation.setEasingCurve(QEasingCurve.OutCubic)
-        self._ripple_animation.finished.connect(self._reset_ripple)
-        self._ripple_animation.start()
+        # Frames blit this instead of rasterising an ellipse each time
+        self._ripple_pix = _ripple_texture(self._ripple_color)
+        
+        self._ripple_t0 = time.perf_counter()
+        self._ripple_timer.start()
+    
+    def _tick(self):
+        """Advance the ripple by one frame"""
+        t = min(1.0, (time.perf_counter() - self._ripple_t0) / RIPPLE_DURATION)
+        self._ripple_radius = _EASE_OUT_CUBIC[int(t * EASE_STEPS)] * self._max_radius
+        
+        # The ripple only grows, so repainting its bounding box covers the last frame too.
+        # Always update(), never repaint(): Qt merges pending updates into one
+        # paintEvent per event-loop pass, so slow frames can't queue up
+        self.update(self._ripple_rect().intersected(self.rect()))
+        
+        if t >= 1.0:
+            self._ripple_timer.stop()
+            self._reset_ripple()
+    
+    def _ripple_rect(self):
+        """Bounding box of the current ripple circle"""
+        r = int(self._ripple_radius) + 1
+        return QRect(self._ripple_pos.x() - r, self._ripple_pos.y() - r, 2 * r, 2 * r)
     
     def _reset_ripple(self):
         """Reset ripple after animation completes"""
         self._ripple_radius = 0
         self.update()
     
-    @pyqtProperty(float)
-    def ripple_radius(self):
-        return self._ripple_radius
-    
-    @ripple_radius.setter
-    def ripple_radius(self, value):
-        self._ripple_radius = value
-        self.update()  # Trigger repaint
-    
     def paintEvent(self, event):
         """Custom paint to draw ripple effect"""
         super().paintEvent(event)
         
-        if self._ripple_radius > 0:
+        if self._ripple_radius > 0 and event.region().intersects(self._ripple_rect()):
             painter = QPainter(self)
-            painter.setRenderHint(QPainter.Antialiasing)
-            
-            # Clip to button shape
-            path = QPainterPath()
-            path.addRoundedRect(self.rect(), 20, 20)  # Match button border-radius
-            painter.setClipPath(path)
+            # Hints are set only when there is a ripple to draw. Not
+            # HighQualityAntialiasing: it is deprecated and ignored by the raster engine
+            painter.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform, True)
+            # Intersect with any clip already on the painter rather than replacing it
+            painter.setClipPath(self._clip_path, Qt.IntersectClip)
             
             # Draw ripple
-            painter.setBrush(self._ripple_color)
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(self._ripple_pos, self._ripple_radius, self._ripple_radius)
+            r = self._ripple_radius
+            target = QRectF(self._ripple_pos.x() - r, self._ripple_pos.y() - r, 2 * r, 2 * r)
+            painter.drawPixmap(target, self._ripple_pix, QRectF(self._ripple_pix.rect()))
@@ -4,6 +4,6 @@ UI Workers - Non-blocking background tasks for UI operations
 """
 
 from ui.workers.image_worker import ImageWorker
-from ui.workers.script_worker import ScriptWorker
+from ui.workers.script_worker import ScriptRunnable, ScriptWorker
 
-__all__ = ['ScriptWorker', 'ImageWorker']
+__all__ = ['ScriptWorker', 'ScriptRunnable', 'ImageWorker']
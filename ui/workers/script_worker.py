@@ -3,64 +3,275 @@
 Enhanced error handling for script generation
 Fix for Issue #7: Better error messages
 """
+import copy
+import difflib
+import hashlib
 import json
-import sys
-import traceback
-from PyQt5.QtCore import QThread, pyqtSignal
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+# Imported once here rather than inside run(), so a worker thread never
+# waits on the service's (heavy) first import
+try:
+    from services.sales_script_service import build_outline
+except ImportError as e:
+    print(f"⚠️ Import warning: {e}")
+    build_outline = None
+
+logger = logging.getLogger(__name__)
+
+# Tracebacks are formatted only when APP_DEBUG is set; otherwise errors
+# are logged as one line (the UI gets the message through the error signal)
+_DEBUG = bool(os.environ.get("APP_DEBUG"))
+
+# User-facing error messages, filled in per failure
+_JSON_ERROR_TEMPLATE = (
+    "JSONDecodeError: Không thể phân tích phản hồi từ LLM.\n"
+    "Lỗi tại dòng {lineno}, cột {colno}: {msg}\n\n"
+    "Khắc phục:\n"
+    "1. Thử lại (LLM có thể tạo phản hồi hợp lệ lần sau)\n"
+    "2. Giảm độ dài nội dung hoặc ý tưởng\n"
+    "3. Đơn giản hóa yêu cầu\n"
+    "4. Kiểm tra kết nối mạng"
+)
+_VALUE_ERROR_TEMPLATE = "ValueError: {}\n\nKhắc phục: Kiểm tra API key và kết nối mạng."
+
+# Outlines of recent configs, oldest first; shared by all workers
+_SCRIPT_CACHE = OrderedDict()
+_CACHE_MAX = 64
+_CACHE_LOCK = threading.Lock()
+
+# Near-duplicate configs: skeleton digest -> recent (normalized text, outline)
+_SEMANTIC_BUCKETS = OrderedDict()
+_SEMANTIC_BUCKETS_MAX = 64
+_SEMANTIC_BUCKET_SIZE = 8
+_SEMANTIC_THRESHOLD = 0.92
+
+# Minimum gap between streamed progress updates (one GUI event each)
+_PROGRESS_INTERVAL = 0.05
+
+# A malformed (unparseable) LLM reply is usually a one-off; retry it before giving up
+_MAX_ATTEMPTS = 3
+_RETRY_BASE_DELAY = 0.5  # seconds, doubled per attempt, plus up to 0.2 s jitter
+
+
+def _config_key(config):
+    """Stable digest of a script config"""
+    blob = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(blob.encode('utf-8'), digest_size=16).hexdigest()
 
-from PyQt5.QtCore import QThread, pyqtSignal
-import traceback
-import json
 
-class ScriptWorker(QThread):
+def _skeleton_key(config):
+    """Digest of the config's shape: keys, value types and rough value lengths"""
+    skeleton = sorted((k, type(v).__name__, len(str(v)) // 32)
+                      for k, v in config.items() if k != "use_semantic_cache")
+    return _config_key(skeleton)
+
+
+def _config_text(config):
+    """The config's string values, normalized for similarity matching"""
+    return " ".join(" ".join(str(config[k]).lower().split())
+                    for k in sorted(config) if isinstance(config[k], str))
+
+
+def _semantic_lookup(config):
+    """Outline of a cached config whose text is nearly the same, or None"""
+    text = _config_text(config)
+    with _CACHE_LOCK:
+        bucket = list(_SEMANTIC_BUCKETS.get(_skeleton_key(config), ()))
+    for cached_text, outline in reversed(bucket):  # newest first
+        sm = difflib.SequenceMatcher(None, text, cached_text, autojunk=False)
+        # Cheap upper bounds first; ratio() is quadratic in the worst case
+        if (sm.real_quick_ratio() >= _SEMANTIC_THRESHOLD
+                and sm.quick_ratio() >= _SEMANTIC_THRESHOLD
+                and sm.ratio() >= _SEMANTIC_THRESHOLD):
+            return outline
+    return None
+
+
+def _semantic_store(config, outline):
+    """Remember outline in its config's skeleton bucket"""
+    key = _skeleton_key(config)
+    with _CACHE_LOCK:
+        bucket = _SEMANTIC_BUCKETS.get(key)
+        if bucket is None:
+            bucket = _SEMANTIC_BUCKETS[key] = deque(maxlen=_SEMANTIC_BUCKET_SIZE)
+            if len(_SEMANTIC_BUCKETS) > _SEMANTIC_BUCKETS_MAX:
+                _SEMANTIC_BUCKETS.popitem(last=False)
+        bucket.append((_config_text(config), outline))
+
+
+class ScriptSignals(QObject):
+    """Signals of a ScriptRunnable (QRunnable is not a QObject)"""
     progress = pyqtSignal(str)
     done = pyqtSignal(object)
     error = pyqtSignal(str)
+
+
+class ScriptRunnable(QRunnable):
+    """Script generation task for a QThreadPool; reuses pooled threads"""
     
     def __init__(self, config):
         super().__init__()
         self.config = config
-        self.should_stop = False
+        self.signals = ScriptSignals()
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._last_progress = ""
+        self._last_progress_ts = 0.0
+    
+    def stop(self):
+        """Ask the task to stop; a pending result is dropped, not emitted"""
+        self._stop.set()
+    
+    def is_finished(self):
+        return self._finished.is_set()
+    
+    def _should_continue(self):
+        return not self._stop.is_set()
+    
+    def _emit_progress(self, msg, throttle=False):
+        """Emit msg unless it repeats the last one; throttled messages are
+        also dropped if the previous one went out under _PROGRESS_INTERVAL ago"""
+        if msg == self._last_progress:
+            return
+        now = time.monotonic()
+        if throttle and now - self._last_progress_ts < _PROGRESS_INTERVAL:
+            return
+        self._last_progress = msg
+        self._last_progress_ts = now
+        self.signals.progress.emit(msg)
+    
+    def _emit_streamed(self, msg):
+        self._emit_progress(msg, throttle=True)
+    
+    def _emit_error(self, error_msg):
+        if not self._stop.is_set():
+            self.signals.error.emit(error_msg)
     
     def run(self):
         try:
-            self.progress.emit("Đang tạo kịch bản...")
+            if self._stop.is_set():
+                return
+            
+            # Opt-in (the panels set it from the app config's "script_cache"):
+            # the same config as a recent run reuses its outline instead of
+            # another LLM round trip. Off by default, since pressing "Viết kịch
+            # bản" again is how users ask for a different script. Copies, so the
+            # UI can't edit the cache
+            use_cache = self.config.get("use_script_cache", False)
+            # Also opt-in ("script_semantic_cache"): a config that differs only
+            # slightly (a reworded idea, a tweaked name) reuses the outline of
+            # its near twin
+            use_semantic = self.config.get("use_semantic_cache", False)
+            cached = None
+            if use_cache:
+                key = _config_key(self.config)
+                with _CACHE_LOCK:
+                    cached = _SCRIPT_CACHE.get(key)
+                    if cached is not None:
+                        _SCRIPT_CACHE.move_to_end(key)
+            if cached is None and use_semantic:
+                cached = _semantic_lookup(self.config)
+            if cached is not None:
+                self._emit_progress("✓ Dùng kết quả đã lưu")
+                self.signals.done.emit(copy.deepcopy(cached))
+                return
+
+            self._emit_progress("Đang tạo kịch bản...")
 
-            from services.sales_script_service import build_outline
+            if build_outline is None:
+                raise ImportError("services.sales_script_service không khả dụng")
 
-            result = build_outline(self.cfg)
+            for attempt in range(_MAX_ATTEMPTS):
+                try:
+                    result = build_outline(self.config, progress=self._emit_streamed,
+                                           should_continue=self._should_continue)
+                    break
+                except json.JSONDecodeError:
+                    # Only malformed replies are worth another round trip; other
+                    # ValueErrors (empty reply, bad config) fail the same way again
+                    if attempt == _MAX_ATTEMPTS - 1 or self._stop.is_set():
+                        raise
+                    self._emit_progress(f"⟳ Thử lại lần {attempt + 2}...")
+                    # Waiting on the stop event keeps stop() responsive
+                    delay = _RETRY_BASE_DELAY * (2 ** attempt) + random.uniform(0, 0.2)
+                    if self._stop.wait(delay):
+                        return
 
-            self.progress.emit("Hoàn thành!")
-            self.done.emit(result)
+            if use_cache or use_semantic:
+                stored = copy.deepcopy(result)
+                if use_cache:
+                    with _CACHE_LOCK:
+                        _SCRIPT_CACHE[key] = stored
+                        if len(_SCRIPT_CACHE) > _CACHE_MAX:
+                            _SCRIPT_CACHE.popitem(last=False)
+                if use_semantic:
+                    _semantic_store(self.config, stored)
+
+            if self._stop.is_set():
+                return
+            self._emit_progress("Hoàn thành!")
+            self.signals.done.emit(result)
 
         except json.JSONDecodeError as e:
             # Enhanced JSON error handling with detailed info
-            error_msg = (
-                f"JSONDecodeError: Không thể phân tích phản hồi từ LLM.\n"
-                f"Lỗi tại dòng {e.lineno}, cột {e.colno}: {e.msg}\n\n"
-                f"Khắc phục:\n"
-                f"1. Thử lại (LLM có thể tạo phản hồi hợp lệ lần sau)\n"
-                f"2. Giảm độ dài nội dung hoặc ý tưởng\n"
-                f"3. Đơn giản hóa yêu cầu\n"
-                f"4. Kiểm tra kết nối mạng"
-            )
-            self.error.emit(error_msg)
-            # Log full traceback for debugging
-            print("[ERROR] JSONDecodeError in ScriptWorker:", file=sys.stderr)
-            traceback.print_exc()
+            error_msg = _JSON_ERROR_TEMPLATE.format(lineno=e.lineno, colno=e.colno, msg=e.msg)
+            self._emit_error(error_msg)
+            logger.error("JSONDecodeError in ScriptWorker: %s", e, exc_info=_DEBUG)
             
         except ValueError as e:
             # Handle empty or invalid responses
-            error_msg = f"ValueError: {str(e)}\n\nKhắc phục: Kiểm tra API key và kết nối mạng."
-            self.error.emit(error_msg)
-            print("[ERROR] ValueError in ScriptWorker:", file=sys.stderr)
-            traceback.print_exc()
+            error_msg = _VALUE_ERROR_TEMPLATE.format(e)
+            self._emit_error(error_msg)
+            logger.error("ValueError in ScriptWorker: %s", e, exc_info=_DEBUG)
             
         except Exception as e:
+            if self._stop.is_set():
+                return  # stopped, e.g. GenerationCancelled mid-stream; nothing to report
             # Include exception type name for better error classification
             error_type = type(e).__name__
             error_msg = f"{error_type}: {str(e)}"
-            self.error.emit(error_msg)
-            # Log full traceback for debugging
-            print(f"[ERROR] {error_type} in ScriptWorker:", file=sys.stderr)
-            traceback.print_exc()
+            self._emit_error(error_msg)
+            logger.error("%s in ScriptWorker: %s", error_type, e, exc_info=_DEBUG)
+        
+        finally:
+            self._finished.set()
+
+
+class ScriptWorker(QObject):
+    """
+    Backwards-compatible front for ScriptRunnable with the old QThread API
+    (progress/done/error, start, isRunning, terminate); runs on the global pool
+    """
+    progress = pyqtSignal(str)
+    done = pyqtSignal(object)
+    error = pyqtSignal(str)
+    
+    def __init__(self, config, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self._runnable = None
+    
+    def start(self):
+        r = ScriptRunnable(self.config)
+        r.signals.progress.connect(self.progress)
+        r.signals.done.connect(self.done)
+        r.signals.error.connect(self.error)
+        self._runnable = r
+        QThreadPool.globalInstance().start(r)
+    
+    def isRunning(self):
+        return self._runnable is not None and not self._runnable.is_finished()
+    
+    def stop(self):
+        if self._runnable is not None:
+            self._runnable.stop()
+    
+    # Pool threads can't be killed; stopping drops the result instead
+    terminate = stop